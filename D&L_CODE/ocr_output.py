@@ -0,0 +1,147 @@
+"""
+OCR结果输出
+
+逐页写出识别结果，支持两种格式：
+  json  : 与 json.dump(indent=2) 相同的数组（默认，便于阅读）
+  jsonl : 每页一行JSON，写完一页立即刷新，适合大批量处理和流式读取
+compact=True 时 bbox 存为整数数组 [x, y, w, h]，并去掉仅用于调试的字段。
+写入过程中内容在临时文件（结果文件名 + .tmp）中，全部写完后才替换为结果文件，
+中途出错或被中断时不会留下看似完整的结果文件。
+"""
+import json
+import os
+
+JSON = 'json'
+JSONL = 'jsonl'
+OUTPUT_FORMATS = (JSON, JSONL)
+
+# 仅用于调试的字段（紧凑模式下去掉）
+_DEBUG_ITEM_FIELDS = ('all_potential_notes',)
+
+
+def format_for_path(path):
+    """
+    按扩展名推断输出格式（.jsonl 为 JSON-lines，其余为 JSON）
+    """
+    return JSONL if os.path.splitext(path)[1].lower() == '.jsonl' else JSON
+
+
+def _int_box(bbox):
+    """
+    bbox 转为整数 [x, y, w, h]：(x, y, w, h) 直接取整，四点文字框取外接矩形
+    """
+    if bbox and isinstance(bbox[0], (list, tuple)):
+        xs = [pt[0] for pt in bbox]
+        ys = [pt[1] for pt in bbox]
+        x, y = int(min(xs)), int(min(ys))
+        return [x, y, int(round(max(xs))) - x, int(round(max(ys))) - y]
+    return [int(round(v)) for v in bbox]
+
+
+def _compact_item(item):
+    return {
+        'text': item['text'],
+        'bbox': _int_box(item['bbox']),
+        'confidence': round(float(item['confidence']), 3),
+    }
+
+
+def compact_page_result(result):
+    """
+    单页结果的紧凑形式：bbox 取整数，去掉调试字段和可由 bbox 算出的中心坐标
+    """
+    items = result['items']
+    compact = {
+        'page': result['page'],
+        'months': [
+            {'month': m['month'], 'type': m['type'], 'bbox': _int_box(m['bbox'])}
+            for m in result['months']
+        ],
+        'items': {
+            'js_items': [_compact_item(item) for item in items['js_items']],
+            'note_numbers': [
+                {
+                    'note_number': pair['note_number'],
+                    'item_number': pair['item_number'],
+                    'note_bbox': _int_box(pair['note_bbox']),
+                    'item_bbox': _int_box(pair['item_bbox']),
+                }
+                for pair in items['note_numbers']
+            ],
+        },
+    }
+    for key, value in items.items():
+        if key not in compact['items'] and key not in _DEBUG_ITEM_FIELDS:
+            compact['items'][key] = value
+    if 'timing' in result:
+        compact['timing'] = result['timing']
+    return compact
+
+
+class ResultWriter:
+    """
+    逐页写出识别结果，每写一页立即刷新到临时文件
+    close() 时才把临时文件替换为结果文件，abort() 删除临时文件
+    fmt: 'json' 或 'jsonl'（None 时按扩展名推断）；compact: 紧凑模式
+    """
+    def __init__(self, path, fmt=None, compact=False):
+        self.path = path
+        self.fmt = fmt or format_for_path(path)
+        if self.fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {self.fmt}")
+        self.compact = compact
+        self.count = 0
+        self.tmp_path = path + '.tmp'
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def write(self, result):
+        if self.compact:
+            result = compact_page_result(result)
+        if self.fmt == JSONL:
+            self.file.write(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+            self.file.write("\n")
+        else:
+            # 以 indent=2 的格式向JSON数组追加一个元素
+            self.file.write("[\n  " if self.count == 0 else ",\n  ")
+            self.file.write(json.dumps(result, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        """
+        写完结尾并把临时文件替换为结果文件
+        """
+        if self.file.closed:
+            return
+        if self.fmt == JSON:
+            self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """
+        放弃写入：删除临时文件，结果文件保持原样
+        """
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_results(path):
+    """
+    读取结果文件（json 或 jsonl），返回各页结果列表
+    """
+    with open(path, encoding='utf-8') as f:
+        if format_for_path(path) == JSONL:
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
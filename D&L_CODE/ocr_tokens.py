@@ -0,0 +1,107 @@
+"""
+OCR文字行分类器
+
+对每行OCR文字只做一次处理，返回带类型的结果：
+月份 / JS项番 / 注番 / 其他。
+全角字符（数字、字母）先做NFKC规范化，月份支持阿拉伯数字和汉字数字，
+相同文字的分类结果用LRU缓存复用。
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+MONTH = 'month'
+JS_ITEM = 'js_item'
+NOTE = 'note'
+OTHER = 'other'
+
+# kind: 类型；text: 规范化后的文字；month: 能解析出月份时为 'YYYY-MM'，否则为 None
+# （项番/注番行也会尝试解析月份，月份识别和项目分类共用同一次处理）
+Token = namedtuple('Token', ['kind', 'text', 'month'])
+
+# 汉字数字月份
+KANJI_MONTHS = {
+    '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6,
+    '七': 7, '八': 8, '九': 9, '十': 10, '十一': 11, '十二': 12,
+}
+
+# 注番：1-3个字母 + 4-6个数字（HA05543, JA21671, RA11360, T614600），且不是JS开头
+_NOTE_RE = re.compile(r'[A-Z]{1,3}\d{4,6}')
+# 「N月」：阿拉伯数字或汉字数字 + 月（汉字按长的优先匹配）
+_MONTH_RE = re.compile(r'(?:(\d{1,2})|(十[一二]?|[一二三四五六七八九]))\s*月')
+_NUMBER_RE = re.compile(r'\d+')
+# 手写月份的词汇：整行只有数字（或汉字数字），可带「月」
+_MONTH_TOKEN_RE = re.compile(r'(?:\d{1,2}|十[一二]?|[一二三四五六七八九])\s*月?')
+
+
+def normalize(text):
+    """
+    去除首尾空白，全角数字/字母/空格转换为半角
+    """
+    return unicodedata.normalize('NFKC', text).strip()
+
+
+class TokenClassifier:
+    """
+    OCR文字行分类器，year 为月份结果使用的年份
+    """
+    def __init__(self, year=2025, cache_size=4096):
+        self.year = year
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, text):
+        text = normalize(text)
+        month = self._parse_month(text)
+
+        if text.startswith('JS'):
+            kind = JS_ITEM
+        elif _NOTE_RE.fullmatch(text.replace(' ', '')):
+            kind = NOTE
+        elif month:
+            kind = MONTH
+        else:
+            kind = OTHER
+        return Token(kind, text, month)
+
+    def _parse_month(self, text):
+        # 「3月」「十二月」
+        for match in _MONTH_RE.finditer(text):
+            digits, kanji = match.groups()
+            month_num = int(digits) if digits else KANJI_MONTHS[kanji]
+            if 1 <= month_num <= 12:
+                return self._format(month_num)
+
+        # 只有汉字数字
+        if text in KANJI_MONTHS:
+            return self._format(KANJI_MONTHS[text])
+
+        # 第一个数字
+        match = _NUMBER_RE.search(text)
+        if match:
+            month_num = int(match.group())
+            if 1 <= month_num <= 12:
+                return self._format(month_num)
+        return None
+
+    def _format(self, month_num):
+        return f"{self.year}-{month_num:02d}"
+
+    def parse_month(self, text):
+        """
+        解析月份文字，返回 'YYYY-MM' 或 None
+        """
+        return self.classify(text).month
+
+    def parse_month_token(self, text):
+        """
+        严格解析：整行必须只由月份词汇组成（如「3月」「１２」「十一月」），
+        否则返回 None；用于不经过文字检测的识别结果
+        """
+        text = normalize(text)
+        if not _MONTH_TOKEN_RE.fullmatch(text):
+            return None
+        return self.classify(text).month
+
+    def cache_info(self):
+        return self.classify.cache_info()
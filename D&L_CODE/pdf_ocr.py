@@ -1,92 +1,939 @@
-import paddleocr
 import cv2
 import numpy as np
 import fitz  # PyMuPDF
 import json
-import re
 from PIL import Image
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import queue
+import threading
+import time
+import hashlib
+import sqlite3
+import multiprocessing
+import contextlib
+import cProfile
+import importlib.metadata
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from ocr_output import JSON, JSONL, ResultWriter
+from ocr_tokens import JS_ITEM, NOTE, TokenClassifier
+
+# 计入每页OCR调用次数的阶段（完整OCR和只识别的快速通道）
+_OCR_STAGES = ('ocr', 'ocr_rec')
+
+# 进程内共享的PaddleOCR引擎（按初始化参数区分），首次使用时才导入并加载模型
+_shared_engines = {}
+_shared_engines_lock = threading.Lock()
+
+def get_shared_ocr(**options):
+    """
+    获取进程内共享的PaddleOCR引擎，相同参数只加载一次模型
+    """
+    key = tuple(sorted(options.items()))
+    engine = _shared_engines.get(key)
+    if engine is None:
+        with _shared_engines_lock:
+            engine = _shared_engines.get(key)
+            if engine is None:
+                try:
+                    import paddleocr
+                except ImportError:
+                    raise ImportError("需要安装 PaddleOCR: pip install paddlepaddle paddleocr") from None
+                engine = paddleocr.PaddleOCR(**options)
+                _shared_engines[key] = engine
+    return engine
+
+def _paddleocr_version():
+    """
+    不导入paddleocr，直接从安装信息读取版本号
+    """
+    try:
+        return importlib.metadata.version('paddleocr')
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+# 渲染时可选的色彩空间
+_FITZ_COLORSPACES = {
+    'bgr': fitz.csRGB,   # 渲染为RGB，转换时重排为BGR
+    'gray': fitz.csGRAY,  # 后续只需要灰度时直接渲染单通道，数据量为1/3
+}
+
+def _pixmap_to_array(pix):
+    """
+    直接从pixmap的原始采样缓冲构建OpenCV图片
+    通道重排与从pixmap缓冲中拷出合并为一次拷贝
+    """
+    samples = getattr(pix, 'samples_mv', None) or pix.samples
+    buf = np.frombuffer(samples, dtype=np.uint8)
+    # 按行跨度切出有效像素，得到 (高, 宽, 通道) 的视图
+    view = buf.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+    view = view.reshape(pix.height, pix.width, pix.n)
+    
+    # 注意：视图不持有pixmap的引用，必须在pixmap释放前拷出
+    if pix.n == 1:
+        return view[:, :, 0].copy()
+    if pix.n == 3:
+        return cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(view, cv2.COLOR_RGBA2BGR)
+
+def _pixmap_to_array_png(pix):
+    """
+    旧路径：PNG编码后再用OpenCV解码（仅用于基准对比）
+    """
+    img_data = pix.tobytes("png")
+    nparr = np.frombuffer(img_data, np.uint8)
+    flags = cv2.IMREAD_GRAYSCALE if pix.n == 1 else cv2.IMREAD_COLOR
+    return cv2.imdecode(nparr, flags)
+
+# 批量识别时拼接图的参数
+_MONTAGE_GAP = 24         # 区域之间的留白，避免文字框跨区域
+# 拼接图最大边长（含留白）：PaddleOCR 检测默认 det_limit_side_len=960（limit_type='max'），
+# 超过的图会被整体缩小，小字容易漏检
+_MONTAGE_MAX_SIDE = 960
+
+def _pack_montages(images, batch_size, max_side=_MONTAGE_MAX_SIDE, gap=_MONTAGE_GAP):
+    """
+    按行排布（shelf packing）把图片分组，每组拼成一张不超过 max_side 的图
+    返回每组的 [(图片序号, x, y), ...]
+    """
+    # _build_montage 会在右侧和底部再留 gap 的白边
+    max_side -= gap
+    batches = []
+    batch = []
+    x = y = row_h = 0
+    for idx, img in enumerate(images):
+        h, w = img.shape[:2]
+        if x > 0 and x + w > max_side:
+            # 换行
+            x, y, row_h = 0, y + row_h + gap, 0
+        if batch and (len(batch) >= batch_size or y + h > max_side):
+            # 开始新的一组
+            batches.append(batch)
+            batch = []
+            x = y = row_h = 0
+        batch.append((idx, x, y))
+        x += w + gap
+        row_h = max(row_h, h)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _build_montage(images, batch, gap=_MONTAGE_GAP):
+    """
+    按 _pack_montages 的排布生成白底拼接图
+    返回拼接图和 [(图片序号, (x, y, w, h)), ...]
+    """
+    placements = []
+    width = height = 0
+    for idx, x, y in batch:
+        h, w = images[idx].shape[:2]
+        placements.append((idx, (x, y, w, h)))
+        width = max(width, x + w)
+        height = max(height, y + h)
+    
+    canvas = np.full((height + gap, width + gap), 255, dtype=np.uint8)
+    for idx, (x, y, w, h) in placements:
+        canvas[y:y+h, x:x+w] = images[idx]
+    return canvas, placements
+
+# 红色标记检测参数
+_RED_MIN_AREA = 100  # 过滤太小的区域
+# HSV中红色跨越色相0/180两端，需要两次 inRange。
+# 把BGR图片按RGB转换（交换R和B）相当于色相镜像 h -> 240°-h，
+# 红色 [0,10] ∪ [170,180) 变为连续区间 [110,130]，只需一次 inRange
+_RED_LOWER = np.array([110, 50, 50])
+_RED_UPPER = np.array([130, 255, 255])
+# 8邻接边界像素数换算为轮廓周长的系数（对圆形精确：2πr / 4√2r）
+_PERIMETER_PER_BOUNDARY_PIXEL = np.pi / (2 * np.sqrt(2))
+_CROSS_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+def _red_mask(image):
+    """
+    单次 inRange 生成红色掩码
+    """
+    # 转换到HSV色彩空间，更容易检测红色（有意按RGB转换，见 _RED_LOWER）
+    hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+    return cv2.inRange(hsv, _RED_LOWER, _RED_UPPER)
+
+def _red_regions_from_mask(mask, offset=(0, 0), min_area=_RED_MIN_AREA):
+    """
+    用连通域统计批量计算红色区域的外接框、面积和圆度
+    结果与 findContours(RETR_EXTERNAL) + contourArea/arcLength 的逐轮廓计算近似一致
+    """
+    # 填充内部孔洞，使连通域对应外轮廓包围的区域（圆圈内部也计入面积）
+    padded = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    outside = padded.copy()
+    flood_mask = np.zeros((padded.shape[0] + 2, padded.shape[1] + 2), np.uint8)
+    cv2.floodFill(outside, flood_mask, (0, 0), 255)
+    filled = (padded | cv2.bitwise_not(outside))[1:-1, 1:-1]
+    
+    n, labels, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(
+        filled, 8, cv2.CV_32S, cv2.CCL_GRANA)
+    if n <= 1:
+        return []
+    
+    # 边界像素：4邻域中有背景的前景像素
+    boundary = filled & ~cv2.erode(filled, _CROSS_KERNEL, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    boundary_counts = np.bincount(labels[boundary > 0], minlength=n)[1:]
+    pixel_counts = stats[1:, cv2.CC_STAT_AREA]
+    
+    # 皮克定理：经过边界像素中心的多边形面积 = 像素数 - 边界像素数/2 - 1
+    areas = pixel_counts - boundary_counts / 2.0 - 1
+    perimeters = boundary_counts * _PERIMETER_PER_BOUNDARY_PIXEL
+    with np.errstate(divide='ignore', invalid='ignore'):
+        circularity = np.where(perimeters > 0, 4 * np.pi * areas / (perimeters * perimeters), 0)
+    
+    keep = np.flatnonzero(areas > min_area)
+    ox, oy = offset
+    red_regions = []
+    for i in keep:
+        x, y, w, h = stats[i + 1, :4].tolist()
+        if perimeters[i] <= 0:
+            mark_type = 'unknown'
+        elif circularity[i] > 0.5:
+            mark_type = 'circle'  # 圆圈
+        else:
+            mark_type = 'cross'   # ×或其他形状
+        red_regions.append({
+            'bbox': (x + ox, y + oy, w, h),
+            'area': float(areas[i]),
+            'type': mark_type
+        })
+    return red_regions
+
+def _red_candidate_rects(mask, scale, size, min_area=_RED_MIN_AREA):
+    """
+    在缩小的红色掩码中找出红色标记的候选区域
+    scale: 掩码相对全分辨率的比例；size: 全分辨率尺寸 (高, 宽)
+    返回全分辨率下留有边距的矩形 [(x1, y1, x2, y2), ...]（重叠的已合并）；
+    标记的类型和面积须在全分辨率下重新判断
+    """
+    # 膨胀后再求连通域，避免细笔画缩小后断开
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(
+        cv2.dilate(mask, np.ones((3, 3), np.uint8)), connectivity=8)
+    if n <= 1:
+        return []
+    
+    # 缩小后笔画像素数会按比例以上地减少，只用外接框过滤：
+    # 外接框换算回全分辨率后比 min_area 还小的斑点不可能是标记
+    boxes = stats[1:, :4].astype(np.float64)
+    boxes = boxes[boxes[:, 2] * boxes[:, 3] >= min_area * scale * scale]
+    if len(boxes) == 0:
+        return []
+    
+    # 映射回全分辨率坐标，留出边距保证整个标记落在候选区域内
+    margin = 2 / scale + 4
+    height, width = size
+    x1 = np.clip(boxes[:, 0] / scale - margin, 0, width).astype(int)
+    y1 = np.clip(boxes[:, 1] / scale - margin, 0, height).astype(int)
+    x2 = np.clip((boxes[:, 0] + boxes[:, 2]) / scale + margin, 0, width).astype(int)
+    y2 = np.clip((boxes[:, 1] + boxes[:, 3]) / scale + margin, 0, height).astype(int)
+    return _merge_rects(list(zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist())))
+
+def _merge_rects(rects):
+    """
+    合并相互重叠的矩形 (x1, y1, x2, y2)，避免同一标记被重复检测
+    """
+    rects = sorted(rects)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for rect in rects:
+            for i, other in enumerate(result):
+                if (rect[0] < other[2] and other[0] < rect[2] and
+                        rect[1] < other[3] and other[1] < rect[3]):
+                    result[i] = (min(rect[0], other[0]), min(rect[1], other[1]),
+                                 max(rect[2], other[2]), max(rect[3], other[3]))
+                    merged = True
+                    break
+            else:
+                result.append(rect)
+        rects = result
+    return rects
+
+# 缓存未命中的标记（缓存的结果本身可能是 None）
+_CACHE_MISS = object()
+
+class OCRResultCache:
+    """
+    基于SQLite的OCR结果缓存
+    键为图片像素哈希 + OCR模型/参数签名，值为 ocr.ocr 的原始结果；
+    总大小超过 max_bytes 时按最近访问时间淘汰
+    """
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, signature=''):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.signature = signature.encode('utf-8')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL模式允许多个工作进程同时读写同一个缓存文件
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS ocr_cache_last_access ON ocr_cache (last_access)")
+        self.conn.commit()
+        self._total = self._total_size()
+
+    def make_key(self, image):
+        """
+        图片像素 + 形状 + 模型签名的哈希
+        """
+        image = np.ascontiguousarray(image)
+        h = hashlib.sha256(self.signature)
+        h.update(f"{image.shape}|{image.dtype}".encode('ascii'))
+        h.update(image.data)
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        返回缓存结果，未命中时返回 _CACHE_MISS
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return _CACHE_MISS
+            self.hits += 1
+            self.conn.execute(
+                "UPDATE ocr_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        value = json.dumps(result, ensure_ascii=False, default=_json_default).encode('utf-8')
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()))
+            self.conn.commit()
+            self._total += len(value)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _total_size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+
+    def _evict(self):
+        """
+        按最近访问时间从旧到新淘汰，直到总大小降到上限的90%
+        """
+        # 其他进程也可能写入，淘汰前重新统计实际大小
+        self._total = self._total_size()
+        target = self.max_bytes * 0.9
+        if self._total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self.conn.execute(
+                "SELECT key, size FROM ocr_cache ORDER BY last_access"):
+            if self._total <= target:
+                break
+            doomed.append((key,))
+            self._total -= size
+        self.conn.executemany("DELETE FROM ocr_cache WHERE key = ?", doomed)
+        self.conn.commit()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self._total}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+def _json_default(obj):
+    """
+    把OCR结果中的NumPy类型转换为可JSON序列化的类型
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"无法序列化的类型: {type(obj)}")
+
+class HandwritingPreprocessor:
+    """
+    手写区域预处理（灰度 -> 去噪 -> 增强对比度 -> 锐化 -> 二值化）
+    adaptive 模式先用拉普拉斯算子快速估计噪声、用直方图估计对比度，再选择去噪强度：
+      fast:   不去噪（干净且对比度足够的区域）
+      medium: 中值滤波去噪
+      full:   NL-means 去噪（原处理方式，最慢）
+    各级别的增强对比度、锐化和二值化相同，输出与原处理方式保持接近
+    默认 full；adaptive 的识别率尚未在实际文档上验证，需要时手动指定
+    """
+    # 噪声估计的拉普拉斯差分核（Immerkær 快速噪声估计）
+    NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], dtype=np.float32)
+
+    def __init__(self, mode='full', threads=0, noise_low=2.0, noise_high=6.0,
+                 min_contrast=80):
+        if mode not in ('adaptive', 'full', 'medium', 'fast'):
+            raise ValueError(f"未知的预处理模式: {mode}")
+        self.mode = mode
+        self.threads = threads
+        self.noise_low = noise_low
+        self.noise_high = noise_high
+        self.min_contrast = min_contrast
+        # CLAHE对象按线程复用，避免每次调用都重新创建
+        self._local = threading.local()
+        self._pool = None
+
+    def _clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            self._local.clahe = clahe
+        return clahe
+
+    def estimate(self, gray):
+        """
+        返回 (噪声标准差估计, 对比度)；对比度为灰度第5到第95百分位的跨度
+        """
+        h, w = gray.shape[:2]
+        if h < 3 or w < 3:
+            return 0.0, 255.0
+        response = cv2.filter2D(gray.astype(np.float32), -1, self.NOISE_KERNEL)
+        sigma = np.sqrt(np.pi / 2) * np.abs(response[1:-1, 1:-1]).sum() / (6 * (w - 2) * (h - 2))
+        hist = np.cumsum(cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel())
+        low = np.searchsorted(hist, hist[-1] * 0.05)
+        high = np.searchsorted(hist, hist[-1] * 0.95)
+        return float(sigma), float(high - low)
+
+    def choose_tier(self, gray):
+        if self.mode != 'adaptive':
+            return self.mode
+        sigma, contrast = self.estimate(gray)
+        if sigma >= self.noise_high:
+            return 'full'
+        if sigma >= self.noise_low or contrast < self.min_contrast:
+            return 'medium'
+        return 'fast'
+
+    def process(self, image_region):
+        """
+        预处理一个区域，返回 (二值图, 使用的处理级别)
+        """
+        # 转为灰度
+        if len(image_region.shape) == 3:
+            gray = cv2.cvtColor(image_region, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image_region.copy()
+        
+        # 去噪
+        tier = self.choose_tier(gray)
+        if tier == 'full':
+            denoised = cv2.fastNlMeansDenoising(gray)
+        elif tier == 'medium':
+            denoised = cv2.medianBlur(gray, 3)
+        else:
+            denoised = gray
+        
+        # 增强对比度
+        enhanced = self._clahe().apply(denoised)
+        
+        # 锐化
+        sharpened = cv2.filter2D(enhanced, -1, self.SHARPEN_KERNEL)
+        
+        # 二值化
+        _, binary = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary, tier
+
+    def __call__(self, image_region):
+        return self.process(image_region)[0]
+
+    def map(self, func, images):
+        """
+        对多张图片执行 func，threads > 1 时使用线程池（结果顺序与输入一致）
+        """
+        if self.threads <= 1 or len(images) <= 1:
+            return [func(img) for img in images]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads,
+                                            thread_name_prefix='preprocess')
+        return list(self._pool.map(func, images))
+
+class Telemetry:
+    """
+    处理过程的计时遥测
+    每个阶段记录墙钟时间、CPU时间（当前线程）和附加字段（区域尺寸、OCR调用次数等），
+    以事件字典的形式写入JSON-lines文件和/或交给回调函数
+    """
+    def __init__(self, jsonl_path=None, callback=None, profile_page=None,
+                 profile_dir=None, profiler='cprofile'):
+        self.jsonl_path = jsonl_path
+        self.callback = callback
+        # 对指定页（从1开始）做完整的性能剖析
+        self.profile_page = profile_page
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.totals = defaultdict(lambda: {'count': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0})
+        self.page_timings = defaultdict(lambda: defaultdict(float))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 追加模式，多个工作进程可以写同一个文件
+        self._file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+
+    @contextlib.contextmanager
+    def stage(self, name, page=None, **fields):
+        """
+        计时一个处理阶段；with 语句得到的字典可以补充字段
+        page 省略时使用当前线程正在处理的页
+        """
+        if page is None:
+            page = getattr(self._local, 'page', None)
+        info = dict(fields)
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        try:
+            yield info
+        finally:
+            event = {
+                'event': 'stage',
+                'stage': name,
+                'page': None if page is None else page + 1,
+                'wall_ms': (time.perf_counter() - wall0) * 1000,
+                'cpu_ms': (time.thread_time() - cpu0) * 1000,
+            }
+            event.update(info)
+            self.emit(event)
+
+    @contextlib.contextmanager
+    def page(self, page_num):
+        """
+        标记当前线程正在处理的页，并计时整页；指定页时同时做性能剖析
+        """
+        self._local.page = page_num
+        try:
+            with self._profile(page_num), self.stage('page', page=page_num) as info:
+                yield info
+                info['ocr_calls'] = int(self.page_timings[page_num].get('ocr_calls', 0))
+        finally:
+            self._local.page = None
+
+    @contextlib.contextmanager
+    def bind_page(self, page_num):
+        """
+        只标记当前线程正在处理的页，不计整页时间
+        （流水线中预处理线程使用，整页时间由OCR线程计）
+        """
+        previous = getattr(self._local, 'page', None)
+        self._local.page = page_num
+        try:
+            yield
+        finally:
+            self._local.page = previous
+
+    @contextlib.contextmanager
+    def _profile(self, page_num):
+        if self.profile_page != page_num + 1:
+            yield
+            return
+        out_dir = self.profile_dir or '.'
+        if self.profiler == 'pyinstrument':
+            # 可选依赖，未安装时回退到 cProfile
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                Profiler = None
+            if Profiler is not None:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    path = os.path.join(out_dir, f"page{page_num + 1}_{os.getpid()}.html")
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(profiler.output_html())
+                    self.emit({'event': 'profile', 'page': page_num + 1, 'path': path})
+                return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(out_dir, f"page{page_num + 1}_{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            self.emit({'event': 'profile', 'page': page_num + 1, 'path': path})
+
+    def emit(self, event):
+        event.setdefault('ts', time.time())
+        event.setdefault('pid', os.getpid())
+        with self._lock:
+            if event.get('event') == 'stage':
+                total = self.totals[event['stage']]
+                total['count'] += 1
+                total['wall_ms'] += event['wall_ms']
+                total['cpu_ms'] += event['cpu_ms']
+                if event['page'] is not None:
+                    timing = self.page_timings[event['page'] - 1]
+                    timing[event['stage'] + '_ms'] += event['wall_ms']
+                    if event['stage'] in _OCR_STAGES:
+                        timing['ocr_calls'] += 1
+            if self._file:
+                self._file.write(json.dumps(event, ensure_ascii=False, default=_json_default) + '\n')
+                self._file.flush()
+        if self.callback:
+            self.callback(event)
+
+    def worker_options(self):
+        """
+        工作进程中重建遥测所需的参数（回调无法跨进程，只能追加写入同一个文件；
+        性能剖析由处理该页的工作进程完成），不需要时返回 None
+        """
+        if not self.jsonl_path and self.profile_page is None:
+            return None
+        return {
+            'jsonl_path': self.jsonl_path,
+            'profile_page': self.profile_page,
+            'profile_dir': self.profile_dir,
+            'profiler': self.profiler,
+        }
+
+    def current_page(self):
+        """
+        当前线程正在处理的页（从0开始），没有时返回 None
+        """
+        return getattr(self._local, 'page', None)
+
+    def pop_page_timing(self, page_num):
+        """
+        取出一页各阶段的累计耗时（毫秒）和OCR调用次数
+        """
+        with self._lock:
+            timing = self.page_timings.pop(page_num, {})
+        return {key: int(value) if key == 'ocr_calls' else round(value, 2)
+                for key, value in timing.items()}
+
+    def summary(self):
+        with self._lock:
+            return {name: dict(total) for name, total in self.totals.items()}
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class _BoxIndex:
+    """
+    OCR文字框的网格空间索引，用于按区域查找重叠的文字框
+    """
+    def __init__(self, lines, cell_size=128):
+        self.lines = lines
+        self.cell_size = cell_size
+        self.rects = []
+        self.grid = {}
+        for i, line in enumerate(lines):
+            xs = [pt[0] for pt in line[0]]
+            ys = [pt[1] for pt in line[0]]
+            rect = (min(xs), min(ys), max(xs), max(ys))
+            self.rects.append(rect)
+            for cell in self._cells(*rect):
+                self.grid.setdefault(cell, []).append(i)
+
+    def _cells(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for gx in range(int(x1 // size), int(x2 // size) + 1):
+            for gy in range(int(y1 // size), int(y2 // size) + 1):
+                yield gx, gy
+
+    def query(self, bbox, min_overlap=0.5):
+        """
+        返回与 bbox (x, y, w, h) 重叠的文字框，按原OCR顺序
+        文字框面积的 min_overlap 以上落在区域内才算重叠
+        """
+        x, y, w, h = bbox
+        qx1, qy1, qx2, qy2 = x, y, x + w, y + h
+        seen = set()
+        hits = []
+        for cell in self._cells(qx1, qy1, qx2, qy2):
+            for i in self.grid.get(cell, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                x1, y1, x2, y2 = self.rects[i]
+                iw = min(x2, qx2) - max(x1, qx1)
+                ih = min(y2, qy2) - max(y1, qy1)
+                if iw <= 0 or ih <= 0:
+                    continue
+                area = max((x2 - x1) * (y2 - y1), 1)
+                if iw * ih >= min_overlap * area:
+                    hits.append(i)
+        return [self.lines[i] for i in sorted(hits)]
+
+def _render_page(page, dpi=300, colorspace='bgr'):
+    """
+    将单页渲染为OpenCV图片
+    """
+    # 高DPI确保文字清晰
+    mat = fitz.Matrix(dpi/72, dpi/72)
+    pix = page.get_pixmap(matrix=mat, colorspace=_FITZ_COLORSPACES[colorspace], alpha=False)
+    
+    # 直接转换为OpenCV格式（不经过PNG编码/解码）
+    return _pixmap_to_array(pix)
+
+def _render_clip(page, bbox, dpi=300, colorspace='gray'):
+    """
+    只渲染页面中的一个区域，bbox 为 dpi 下的像素坐标 (x, y, w, h)
+    """
+    x, y, w, h = bbox
+    zoom = dpi / 72
+    mat = fitz.Matrix(zoom, zoom)
+    clip = fitz.Rect(x / zoom, y / zoom, (x + w) / zoom, (y + h) / zoom)
+    pix = page.get_pixmap(matrix=mat, clip=clip, colorspace=_FITZ_COLORSPACES[colorspace], alpha=False)
+    return _pixmap_to_array(pix)
+
+# ROI模式下逐个裁剪渲染的区域数上限。扫描件每次裁剪渲染都要重新解码整页图像，
+# 区域较多时改为把所有区域的外接矩形渲染一次再切片
+_ROI_MAX_CLIPS = 4
+
+class _ClipRenderer:
+    """
+    按需渲染手写区域：区域少时逐个裁剪渲染，区域多时只渲染一次外接矩形
+    """
+    def __init__(self, page, bboxes, dpi=300, colorspace='gray'):
+        self.page = page
+        self.dpi = dpi
+        self.colorspace = colorspace
+        self.union = None
+        self.union_image = None
+        if len(bboxes) > _ROI_MAX_CLIPS:
+            self.union = (min(x for x, _, _, _ in bboxes),
+                          min(y for _, y, _, _ in bboxes),
+                          max(x + w for x, _, w, _ in bboxes),
+                          max(y + h for _, y, _, h in bboxes))
+
+    def __call__(self, x, y, w, h):
+        if self.union is None:
+            return _render_clip(self.page, (x, y, w, h), self.dpi, self.colorspace)
+        ux, uy, ux2, uy2 = self.union
+        if self.union_image is None:
+            self.union_image = _render_clip(self.page, (ux, uy, ux2 - ux, uy2 - uy), self.dpi,
+                                            self.colorspace)
+        return self.union_image[y - uy:y - uy + h, x - ux:x - ux + w]
+
+def _page_pixel_size(page, dpi=300):
+    """
+    页面按 dpi 渲染后的像素尺寸 (高, 宽)
+    """
+    zoom = dpi / 72
+    irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return irect.height, irect.width
+
+def _scale_ocr_result(result, scale):
+    """
+    把OCR结果中的文字框坐标按比例换算
+    """
+    if not result or not result[0]:
+        return result
+    return [[
+        [[[pt[0] * scale, pt[1] * scale] for pt in line[0]], line[1]]
+        for line in result[0]
+    ]]
 
 class PDFHandwritingOCR:
-    def __init__(self):
-        # 初始化PaddleOCR，专门用于日语识别
-        self.ocr = paddleocr.PaddleOCR(
-            use_angle_cls=True,  # 修复：使用正确的参数名
-            lang='japan'  # 日语识别
-        )
-        
-        # 日语月份映射
-        self.month_mapping = {
-            '1月': '2025-01', '１月': '2025-01', '一月': '2025-01',
-            '2月': '2025-02', '２月': '2025-02', '二月': '2025-02',
-            '3月': '2025-03', '３月': '2025-03', '三月': '2025-03',
-            '4月': '2025-04', '４月': '2025-04', '四月': '2025-04',
-            '5月': '2025-05', '５月': '2025-05', '五月': '2025-05',
-            '6月': '2025-06', '６月': '2025-06', '六月': '2025-06',
-            '7月': '2025-07', '７月': '2025-07', '七月': '2025-07',
-            '8月': '2025-08', '８月': '2025-08', '八月': '2025-08',
-            '9月': '2025-09', '９月': '2025-09', '九月': '2025-09',
-            '10月': '2025-10', '１０月': '2025-10', '十月': '2025-10',
-            '11月': '2025-11', '１１月': '2025-11', '十一月': '2025-11',
-            '12月': '2025-12', '１２月': '2025-12', '十二月': '2025-12'
+    def __init__(self, use_angle_cls=True, lang='japan', ocr_batch_size=16,
+                 reuse_page_ocr=False, cache_path=None, cache_max_mb=512,
+                 red_prescale=0.25, roi_detect_dpi=None, roi_item_dpi=None,
+                 ocr_engine=None, telemetry=None, include_timing=False,
+                 preprocess='full', preprocess_threads=0,
+                 note_max_dx=24, note_max_dy=36, note_one_to_one=False,
+                 year=2025, warm_up=False, pipeline_threads=0, pipeline_depth=2,
+                 rec_fast_path=False, rec_min_confidence=0.8):
+        # PaddleOCR参数，专门用于日语识别
+        self.ocr_options = {
+            'use_angle_cls': use_angle_cls,  # 修复：使用正确的参数名
+            'lang': lang  # 日语识别
         }
+        # 外部传入的OCR引擎（需提供与PaddleOCR相同的 ocr() 接口）；
+        # 未传入时在第一次识别时才加载进程内共享的PaddleOCR（见 ocr 属性）
+        self._ocr = ocr_engine
+        self._engine_name = type(ocr_engine).__name__ if ocr_engine is not None else 'PaddleOCR'
+        
+        # 手写区域批量识别时每批拼接的图片数量（1 表示逐个识别）
+        self.ocr_batch_size = ocr_batch_size
+        
+        # 复用整页OCR结果识别月份，仅在区域内没有文字框时才单独识别该区域
+        self.reuse_page_ocr = reuse_page_ocr
+        
+        # 红色标记低分辨率预检的缩放比例（默认1/4；None 或 0 表示直接全分辨率检测）
+        self.red_prescale = red_prescale
+        
+        # ROI模式：按 roi_detect_dpi 整页检测红色标记，只把手写区域按全分辨率渲染
+        # （None 表示整页按全分辨率渲染）
+        self.roi_detect_dpi = roi_detect_dpi
+        # 项番/注番整页识别的DPI（None 表示与 dpi 相同，灰度渲染）；
+        # 设为150等较低值可减少渲染和识别时间，但小号印刷文字的识别率会下降，需自行确认
+        self.roi_item_dpi = roi_item_dpi
+        
+        # 手写区域预处理（默认 'full' 总是做完整去噪；'adaptive' 按噪声分级处理，
+        # 速度更快，但识别率需自行确认后再启用）
+        self.preprocessor = HandwritingPreprocessor(preprocess, preprocess_threads)
+        
+        # 注番-项番匹配阈值（PDF点，1/72英寸；按DPI换算为像素，默认即300DPI下的100/150像素，
+        # 与纸张大小和横竖方向无关）
+        self.note_max_dx = note_max_dx
+        self.note_max_dy = note_max_dy
+        # 每个注番最多对应一个项番
+        self.note_one_to_one = note_one_to_one
+        
+        # 计时遥测（可传入 Telemetry 对象或JSON-lines文件路径）
+        if isinstance(telemetry, str):
+            telemetry = Telemetry(telemetry)
+        elif isinstance(telemetry, dict):
+            # 工作进程：由主进程的 Telemetry.worker_options() 重建
+            telemetry = Telemetry(**telemetry)
+        self.telemetry = telemetry
+        # 在每页结果中附带各阶段耗时
+        self.include_timing = include_timing
+        
+        # OCR结果缓存（可选）
+        self.cache_max_mb = cache_max_mb
+        self.cache = None
+        if cache_path:
+            self.open_cache(cache_path)
+        
+        # 可在多份PDF之间复用的工作进程池（见 open_worker_pool）
+        self.worker_pool = None
+        
+        # 单进程流水线：渲染线程、pipeline_threads 个检测/预处理线程、OCR在当前线程，
+        # 最多 pipeline_depth 页在预处理中（0 表示各步骤依次执行）
+        self.pipeline_threads = pipeline_threads
+        self.pipeline_depth = pipeline_depth
+        
+        # 手写月份的识别快速通道：跳过文字检测和方向分类，直接批量识别小图；
+        # 结果不是月份词汇或置信度低于 rec_min_confidence 时再走完整OCR
+        self.rec_fast_path = rec_fast_path
+        self.rec_min_confidence = rec_min_confidence
+        
+        # 识别结果使用的年份
+        self.year = year
+        
+        # OCR文字行分类器（月份/JS项番/注番），结果按文字缓存
+        self.tokens = TokenClassifier(year)
+        
+        # 预热：提前加载模型并识别一张小图，使第一页不承担初始化开销
+        self.warm_up_on_start = warm_up
+        if warm_up:
+            self.warm_up()
 
-    def pdf_to_images(self, pdf_path, dpi=300):
+    def pdf_to_images(self, pdf_path, dpi=300, colorspace='bgr'):
         """
         将PDF转换为高质量图片
+        colorspace: 'bgr' 彩色（默认），'gray' 直接渲染为灰度
+        """
+        return [img for _, img in self._render_pages(pdf_path, dpi, colorspace)]
+
+    def _render_pages(self, pdf_path, dpi=300, colorspace='bgr', pages=None):
+        """
+        逐页渲染PDF，依次产出 (页码, 图片)
+        pages: 只渲染这些页码（None 表示全部）
         """
         doc = fitz.open(pdf_path)
-        images = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            # 高DPI确保文字清晰
-            mat = fitz.Matrix(dpi/72, dpi/72)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            
-            # 转换为OpenCV格式
-            nparr = np.frombuffer(img_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            images.append(img)
-            
-        doc.close()
-        return images
+        try:
+            for page_num in (range(len(doc)) if pages is None else pages):
+                with self._stage('render', page=page_num, dpi=dpi):
+                    image = _render_page(doc[page_num], dpi, colorspace)
+                yield page_num, image
+        finally:
+            doc.close()
+
+    def iter_pdf_pages(self, pdf_path, dpi=300, prefetch=2, colorspace='bgr', pages=None):
+        """
+        流式渲染PDF页面，按顺序产出 (页码, 图片)
+        后台线程最多提前渲染 prefetch 页，内存占用不随总页数增长
+        """
+        if prefetch <= 0:
+            yield from self._render_pages(pdf_path, dpi, colorspace, pages)
+            return
+
+        buffer = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        end = object()
+
+        def put(item):
+            # 缓冲区满时等待，消费者提前退出时放弃
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for item in self._render_pages(pdf_path, dpi, colorspace, pages):
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(end)
+
+        worker = threading.Thread(target=producer, name="pdf-render", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
 
-    def detect_red_marks(self, image):
+    def detect_red_marks(self, image, prescale=None, min_area=_RED_MIN_AREA):
         """
         检测红色标记（圆圈和×）
+        prescale: 0~1 之间时先按该比例缩小整页粗检红色候选区域，
+                  只在候选区域内做全分辨率检测（省略时使用 red_prescale，0 表示整页全分辨率检测）
+        min_area: 过滤太小区域的面积阈值（像素）
         """
-        # 转换到HSV色彩空间，更容易检测红色
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        
-        # 红色的HSV范围
-        lower_red1 = np.array([0, 50, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 50, 50])
-        upper_red2 = np.array([180, 255, 255])
-        
-        # 创建红色掩码
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        red_mask = mask1 + mask2
-        
-        # 查找红色区域的轮廓
-        contours, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        prescale = prescale if prescale is not None else self.red_prescale
+        if prescale and 0 < prescale < 1:
+            return self._detect_red_marks_coarse(image, prescale, min_area)
+        return _red_regions_from_mask(_red_mask(image), min_area=min_area)
+
+    def _detect_red_marks_coarse(self, image, prescale, min_area=_RED_MIN_AREA):
+        """
+        低分辨率粗检 + 候选区域内全分辨率精检
+        """
+        small = cv2.resize(image, None, fx=prescale, fy=prescale, interpolation=cv2.INTER_AREA)
+        rects = _red_candidate_rects(_red_mask(small), prescale, image.shape[:2], min_area)
         
         red_regions = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 100:  # 过滤太小的区域
-                x, y, w, h = cv2.boundingRect(contour)
-                red_regions.append({
-                    'bbox': (x, y, w, h),
-                    'area': area,
-                    'type': self.classify_red_mark(contour)
-                })
+        for rx1, ry1, rx2, ry2 in rects:
+            roi_mask = _red_mask(image[ry1:ry2, rx1:rx2])
+            red_regions.extend(_red_regions_from_mask(roi_mask, offset=(rx1, ry1), min_area=min_area))
+        return red_regions
+
+    def detect_red_marks_roi(self, page, dpi=300, min_area=_RED_MIN_AREA):
+        """
+        ROI模式的红色标记检测：按 roi_detect_dpi 渲染整页只找候选区域，
+        各候选区域再按 dpi 裁剪渲染，在全分辨率下过滤面积并判断圆圈/×
+        （结果与整页按 dpi 检测相同，坐标为 dpi 下的像素坐标）
+        """
+        scale = self.roi_detect_dpi / dpi
+        preview = _render_page(page, self.roi_detect_dpi)
+        rects = _red_candidate_rects(_red_mask(preview), scale, _page_pixel_size(page, dpi), min_area)
+        del preview
         
+        clips = _ClipRenderer(page, [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in rects],
+                              dpi, colorspace='bgr')
+        red_regions = []
+        for x1, y1, x2, y2 in rects:
+            roi_mask = _red_mask(clips(x1, y1, x2 - x1, y2 - y1))
+            red_regions.extend(_red_regions_from_mask(roi_mask, offset=(x1, y1), min_area=min_area))
         return red_regions
 
     def classify_red_mark(self, contour):
@@ -108,7 +955,9 @@ class PDFHandwritingOCR:
     def extract_handwriting_regions(self, image, red_regions):
         """
         基于红色标记提取手写区域
+        image 也可以直接传入页面尺寸 (高, 宽)
         """
+        height, width = image.shape[:2] if hasattr(image, 'shape') else image[:2]
         handwriting_regions = []
         
         for red_region in red_regions:
@@ -121,8 +970,8 @@ class PDFHandwritingOCR:
                 expand = 30
                 hw_x = max(0, x - expand)
                 hw_y = max(0, y - expand)
-                hw_w = min(image.shape[1] - hw_x, w + 2*expand)
-                hw_h = min(image.shape[0] - hw_y, h + 2*expand)
+                hw_w = min(width - hw_x, w + 2*expand)
+                hw_h = min(height - hw_y, h + 2*expand)
                 
                 handwriting_regions.append({
                     'bbox': (hw_x, hw_y, hw_w, hw_h),
@@ -145,93 +994,196 @@ class PDFHandwritingOCR:
         """
         增强手写图像，提高识别准确率
         """
-        # 转为灰度
-        if len(image_region.shape) == 3:
-            gray = cv2.cvtColor(image_region, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image_region.copy()
-        
-        # 去噪
-        denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # 增强对比度
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
-        
-        # 锐化
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(enhanced, -1, kernel)
-        
-        # 二值化
-        _, binary = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        return binary
+        return self.preprocessor(image_region)
 
     def recognize_month_text(self, image_region):
         """
         识别手写月份文字
         """
         # 图像增强
-        enhanced_img = self.enhance_handwriting_image(image_region)
+        with self._stage('enhance', crop=list(image_region.shape[:2])) as info:
+            enhanced_img, info['tier'] = self.preprocessor.process(image_region)
+        
+        if self.rec_fast_path:
+            month = self._rec_only_months([enhanced_img])[0]
+            if month:
+                return month
         
         # 使用PaddleOCR识别
         try:
-            result = self.ocr.ocr(enhanced_img)
+            result = self._run_ocr(enhanced_img)
             
             if result and result[0]:
-                # 提取所有识别到的文字
-                texts = []
-                for line in result[0]:
-                    text = line[1][0]
-                    confidence = line[1][1]
-                    if confidence > 0.3:  # 置信度阈值
-                        texts.append(text)
-                
-                # 查找月份
-                for text in texts:
-                    month = self.parse_month(text)
-                    if month:
-                        return month
+                return self._month_from_lines(result[0])
                         
         except Exception as e:
             print(f"OCR识别错误: {e}")
         
         return None
 
-    def parse_month(self, text):
+    def _month_from_lines(self, lines):
         """
-        解析月份文字，返回标准格式
+        从OCR结果行中查找第一个可解析的月份
         """
-        # 清理文字
-        text = text.strip()
+        # 提取所有识别到的文字
+        texts = []
+        for line in lines:
+            text = line[1][0]
+            confidence = line[1][1]
+            if confidence > 0.3:  # 置信度阈值
+                texts.append(text)
         
-        # 直接匹配
-        if text in self.month_mapping:
-            return self.month_mapping[text]
+        # 查找月份
+        for text in texts:
+            month = self.parse_month(text)
+            if month:
+                return month
+        return None
+
+    def recognize_month_batch(self, image_regions, batch_size=None):
+        """
+        批量识别手写月份文字
+        将多个增强后的区域拼接成一张图，一次OCR调用识别整批，
+        再按文字框中心点映射回各区域；返回与输入顺序一致的月份列表
+        """
+        batch_size = batch_size or self.ocr_batch_size
+        if batch_size <= 1:
+            return [self.recognize_month_text(img) for img in image_regions]
+        prepared = self._prepare_month_batch(image_regions, batch_size)
+        return self._recognize_enhanced(*prepared, batch_size=batch_size)
+
+    def _prepare_month_batch(self, image_regions, batch_size=None):
+        """
+        批量识别中不调用OCR的部分：增强各区域并拼接，返回 (增强后的图片, 拼接图)
+        拼接图为 [(拼接图, 各区域位置), ...]；使用识别快速通道时为 None（只为未通过的区域再拼接）
+        """
+        batch_size = batch_size or self.ocr_batch_size
+        # OpenCV处理时会释放GIL，多个区域可以在线程池中并行预处理
+        page = self.telemetry.current_page() if self.telemetry else None
+        def enhance(img):
+            with self._stage('enhance', page=page, crop=list(img.shape[:2])) as info:
+                binary, info['tier'] = self.preprocessor.process(img)
+            return binary
+        enhanced = self.preprocessor.map(enhance, image_regions)
+        if self.rec_fast_path:
+            return enhanced, None
+        return enhanced, self._build_montages(enhanced, batch_size)
+
+    def _recognize_enhanced(self, enhanced, montages=None, batch_size=None):
+        """
+        识别已增强的各区域，返回月份列表
+        先走识别快速通道（启用时），未通过的区域拼接后走完整OCR
+        """
+        months = [None] * len(enhanced)
+        pending = list(range(len(enhanced)))
+        if self.rec_fast_path:
+            months = self._rec_only_months(enhanced)
+            pending = [i for i, month in enumerate(months) if month is None]
+            montages = None
+        if pending:
+            if montages is None:
+                montages = self._build_montages([enhanced[i] for i in pending], batch_size)
+            for i, month in zip(pending, self._ocr_month_montages(montages, len(pending))):
+                months[i] = month
+        return months
+
+    def _rec_only_months(self, images):
+        """
+        识别快速通道：不做文字检测和方向分类，把各区域作为一批直接送入识别模型
+        只接受整行都是月份词汇（数字、全角数字、汉字数字、月）且置信度足够的结果，
+        其余区域返回 None
+        """
+        months = [None] * len(images)
+        if not images:
+            return months
+        # 识别模型需要三通道图片
+        crops = [cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img for img in images]
         
-        # 模糊匹配
-        for month_text, standard_format in self.month_mapping.items():
-            if month_text in text or text in month_text:
-                return standard_format
+        # 启用缓存时逐张查找，只识别未命中的
+        results = [_CACHE_MISS] * len(crops)
+        keys = None
+        if self.cache is not None:
+            keys = ['rec:' + self.cache.make_key(crop) for crop in crops]
+            results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is _CACHE_MISS]
+        if missing:
+            with self._stage('ocr_rec', crops=len(missing)):
+                try:
+                    # det=False 时可传入图片列表，识别结果为 [[(文字, 置信度), ...]]
+                    lines = self.ocr.ocr([crops[i] for i in missing], det=False, cls=False)[0]
+                except Exception as e:
+                    print(f"快速识别错误: {e}")
+                    return months
+            if len(lines) != len(missing):
+                return months
+            for i, line in zip(missing, lines):
+                results[i] = [line[0], float(line[1])]
+                if keys is not None:
+                    self.cache.put(keys[i], results[i])
         
-        # 数字匹配
-        numbers = re.findall(r'\d+', text)
-        if numbers:
+        for i, (text, confidence) in enumerate(results):
+            if confidence >= self.rec_min_confidence:
+                months[i] = self.tokens.parse_month_token(text)
+        return months
+
+    def _build_montages(self, enhanced, batch_size=None):
+        """
+        把增强后的区域按批拼接，返回 [(拼接图, 各区域位置), ...]
+        """
+        batch_size = batch_size or self.ocr_batch_size
+        page = self.telemetry.current_page() if self.telemetry else None
+        montages = []
+        for batch in _pack_montages(enhanced, batch_size):
+            canvas, placements = _build_montage(enhanced, batch)
+            if self.telemetry:
+                self.telemetry.emit({'event': 'montage', 'page': None if page is None else page + 1,
+                                     'regions': len(batch), 'shape': list(canvas.shape[:2])})
+            montages.append((canvas, placements))
+        return montages
+
+    def _ocr_month_montages(self, montages, count):
+        """
+        识别拼接图，按文字框中心点把结果分配回各区域，返回 count 个区域的月份列表
+        """
+        months = [None] * count
+        for canvas, placements in montages:
             try:
-                month_num = int(numbers[0])
-                if 1 <= month_num <= 12:
-                    return f"2025-{month_num:02d}"
-            except:
-                pass
+                result = self._run_ocr(canvas)
+            except Exception as e:
+                print(f"OCR识别错误: {e}")
+                continue
+            
+            # 按文字框中心点把识别结果分配回各区域
+            region_lines = {idx: [] for idx, _ in placements}
+            if result and result[0]:
+                for line in result[0]:
+                    bbox = line[0]
+                    center_x = (bbox[0][0] + bbox[2][0]) / 2
+                    center_y = (bbox[0][1] + bbox[2][1]) / 2
+                    for idx, (px, py, pw, ph) in placements:
+                        if px <= center_x < px + pw and py <= center_y < py + ph:
+                            region_lines[idx].append(line)
+                            break
+            
+            for idx, lines in region_lines.items():
+                months[idx] = self._month_from_lines(lines)
         
-        return None
+        return months
 
-    def extract_item_info(self, image, red_regions):
+    def parse_month(self, text):
+        """
+        解析月份文字，返回标准格式
+        """
+        return self.tokens.parse_month(text)
+
+    def extract_item_info(self, image, red_regions, ocr_result=None, dpi=None):
         """
         提取项番和注番信息
+        ocr_result: 已有的整页OCR结果，传入时不再重复识别
+        dpi: 结果坐标对应的DPI（用于换算匹配阈值），省略时按300DPI
         """
         try:
-            result = self.ocr.ocr(image)
+            result = ocr_result if ocr_result is not None else self._run_ocr(image)
             
             js_items = []  # JS项番
             potential_notes = []  # 潜在的注番
@@ -241,13 +1193,14 @@ class PDFHandwritingOCR:
                     text = line[1][0].strip()
                     bbox = line[0]
                     confidence = line[1][1]
+                    kind = self.tokens.classify(text).kind
                     
                     # 提取中心点坐标用于位置判断
                     center_y = (bbox[0][1] + bbox[2][1]) / 2
                     center_x = (bbox[0][0] + bbox[2][0]) / 2
                     
                     # 查找JS开头的项番
-                    if text.startswith('JS'):
+                    if kind == JS_ITEM:
                         js_items.append({
                             'type': 'item_number',
                             'text': text,
@@ -258,7 +1211,7 @@ class PDFHandwritingOCR:
                         })
                     
                     # 查找潜在的注番 (字母+数字组合，且不是JS开头)
-                    elif self.is_potential_note_number(text):
+                    elif kind == NOTE:
                         potential_notes.append({
                             'type': 'potential_note',
                             'text': text,
@@ -269,7 +1222,8 @@ class PDFHandwritingOCR:
                         })
             
             # 匹配注番和项番的对应关系
-            note_item_pairs = self.match_notes_to_items(potential_notes, js_items)
+            with self._stage('match_notes', notes=len(potential_notes), items=len(js_items)):
+                note_item_pairs = self.match_notes_to_items(potential_notes, js_items, dpi)
             
             return {
                 'js_items': js_items,
@@ -284,124 +1238,845 @@ class PDFHandwritingOCR:
     def is_potential_note_number(self, text):
         """
         判断文本是否可能是注番
+        注番：1-3个字母 + 4-6个数字（HA05543, JA21671, RA11360, T614600），且不是JS开头
         """
-        # 清理文本
-        text = text.strip().replace(' ', '')
-        
-        # 注番的可能模式：
-        # 1. 字母开头 + 数字：HA05543, JA21671, RA11360, T614600
-        # 2. 长度通常在6-8位
-        # 3. 不是JS开头
-        
-        patterns = [
-            r'^[A-Z]{1,3}\d{4,6}$',  # 修复：正确关闭正则表达式，1-3个字母 + 4-6个数字
-            r'^[A-Z]\d{6}$',         # 修复：正确关闭正则表达式，1个字母 + 6个数字
-            r'^[A-Z]{2}\d{5}$',      # 修复：正确关闭正则表达式，2个字母 + 5个数字
-        ]
-        
-        for pattern in patterns:
-            if re.match(pattern, text) and not text.startswith('JS'):
-                return True
-        return False
+        return self.tokens.classify(text).kind == NOTE
 
-    def match_notes_to_items(self, potential_notes, js_items):
+    def match_notes_to_items(self, potential_notes, js_items, dpi=None, one_to_one=None):
         """
         根据位置关系匹配注番和项番
         注番通常在对应项番的上方
+        dpi: 坐标对应的DPI，阈值（PDF点）按 dpi/72 换算为像素；省略时按300DPI
+        one_to_one: 每个注番最多对应一个项番（全局按距离从近到远分配）
         """
-        matched_pairs = []
+        if one_to_one is None:
+            one_to_one = self.note_one_to_one
+        
+        # 阈值：X坐标差距上限、注番在项番上方的最大距离
+        scale = (dpi or 300) / 72
+        max_dx = self.note_max_dx * scale
+        max_dy = self.note_max_dy * scale
         
-        for js_item in js_items:
+        # 按阈值大小的网格分桶，每个项番只检查附近的桶
+        grid = defaultdict(list)
+        for idx, note in enumerate(potential_notes):
+            grid[(int(note['center_x'] // max_dx), int(note['center_y'] // max_dy))].append(idx)
+        
+        # 找到在各JS项番上方且X坐标相近的注番
+        candidates = []  # (距离, 项番序号, 注番序号)
+        for js_idx, js_item in enumerate(js_items):
             js_y = js_item['center_y']
             js_x = js_item['center_x']
+            gx = int(js_x // max_dx)
+            gy = int(js_y // max_dy)
             
-            # 找到在此JS项番上方且X坐标相近的注番
-            candidates = []
+            nearby = []
+            for cx in (gx - 1, gx, gx + 1):
+                for cy in (gy - 1, gy):
+                    nearby.extend(grid.get((cx, cy), ()))
             
-            for note in potential_notes:
+            for idx in sorted(nearby):
+                note = potential_notes[idx]
                 note_y = note['center_y']
-                note_x = note['center_x']
                 
-                # 条件：注番在JS上方，且X坐标差距不太大
-                if (note_y < js_y and  # 注番在上方
-                    abs(note_x - js_x) < 100 and  # X坐标相近 (可调整阈值)
-                    js_y - note_y < 150):  # 距离不要太远 (可调整阈值)
-                    
-                    candidates.append({
-                        'note': note,
-                        'distance': js_y - note_y
-                    })
-            
-            # 选择距离最近的作为对应的注番
-            if candidates:
-                closest = min(candidates, key=lambda x: x['distance'])
-                matched_pairs.append({
-                    'note_number': closest['note']['text'],
-                    'item_number': js_item['text'],
-                    'note_bbox': closest['note']['bbox'],
-                    'item_bbox': js_item['bbox']
-                })
+                # 条件：注番在JS上方，且X坐标差距不太大，距离不要太远
+                if (note_y < js_y and
+                        abs(note['center_x'] - js_x) < max_dx and
+                        js_y - note_y < max_dy):
+                    candidates.append((js_y - note_y, js_idx, idx))
+        
+        # 选择距离最近的作为对应的注番
+        chosen = {}
+        if one_to_one:
+            used = set()
+            for distance, js_idx, idx in sorted(candidates):
+                if js_idx not in chosen and idx not in used:
+                    chosen[js_idx] = idx
+                    used.add(idx)
+        else:
+            best = {}
+            for distance, js_idx, idx in candidates:
+                if js_idx not in best or distance < best[js_idx][0]:
+                    best[js_idx] = (distance, idx)
+            chosen = {js_idx: idx for js_idx, (_, idx) in best.items()}
+        
+        matched_pairs = []
+        for js_idx in sorted(chosen):
+            js_item = js_items[js_idx]
+            note = potential_notes[chosen[js_idx]]
+            matched_pairs.append({
+                'note_number': note['text'],
+                'item_number': js_item['text'],
+                'note_bbox': note['bbox'],
+                'item_bbox': js_item['bbox']
+            })
         
         return matched_pairs
 
-    def process_pdf(self, pdf_path, output_file=None):
+    def process_page(self, image, page_num, dpi=None):
         """
-        处理PDF文件的主函数
+        处理单页图片，返回该页结果
+        dpi: 图片的渲染DPI（用于换算注番匹配阈值），省略时按300DPI
         """
-        print(f"开始处理PDF: {pdf_path}")
+        with self._page_scope(page_num):
+            prepared = self._prepare_page(image)
+            result = self._finish_page(image, page_num, prepared, dpi)
+        return self._attach_timing(result, page_num)
+
+    def _prepare_page(self, image):
+        """
+        单页处理中不调用OCR的部分：检测红色标记、提取手写区域并预处理
+        返回 (红色标记, 手写区域, 预处理结果)；需要先整页OCR时预处理结果为 None
+        """
+        # 2. 检测红色标记
+        with self._stage('detect_red_marks') as info:
+            red_regions = self.detect_red_marks(image)
+            info['marks'] = len(red_regions)
+        print(f"检测到 {len(red_regions)} 个红色标记")
         
-        # 1. PDF转图片
-        images = self.pdf_to_images(pdf_path)
-        print(f"转换了 {len(images)} 页图片")
+        # 3. 提取手写区域
+        handwriting_regions = self.extract_handwriting_regions(image, red_regions)
         
-        all_results = []
+        # 不复用整页OCR时所有区域都要单独识别，可以提前增强并拼接
+        months_prepared = None
+        if not self.reuse_page_ocr and self.ocr_batch_size > 1:
+            months_prepared = self._prepare_month_batch(
+                [image[y:y+h, x:x+w] for x, y, w, h in (r['bbox'] for r in handwriting_regions)])
+        return red_regions, handwriting_regions, months_prepared
+
+    def _finish_page(self, image, page_num, prepared, dpi=None):
+        """
+        单页处理中调用OCR的部分，返回该页结果
+        """
+        red_regions, handwriting_regions, months_prepared = prepared
         
-        for page_num, image in enumerate(images):
-            print(f"\n处理第 {page_num + 1} 页...")
-            
-            # 2. 检测红色标记
-            red_regions = self.detect_red_marks(image)
+        # 4. 识别手写月份
+        # 整页只做一次OCR时，先用与手写区域重叠的文字框解析月份
+        page_ocr = self._ocr_page(image) if self.reuse_page_ocr else None
+        with self._stage('recognize_months', regions=len(handwriting_regions)):
+            page_results = self._recognize_regions(
+                handwriting_regions, page_ocr,
+                lambda x, y, w, h: image[y:y+h, x:x+w], months_prepared)
+        
+        # 5. 提取项番信息
+        with self._stage('extract_item_info'):
+            items = self.extract_item_info(image, red_regions, ocr_result=page_ocr, dpi=dpi)
+        
+        return {
+            'page': page_num + 1,
+            'months': page_results,
+            'items': items
+        }
+
+    def process_page_roi(self, page, page_num, dpi=300):
+        """
+        两级分辨率处理单页（ROI模式）：
+        低DPI整页渲染检测红色标记，只把手写区域按 dpi 裁剪渲染后识别，
+        项番/注番用灰度整页识别（默认按 dpi，指定 roi_item_dpi 时按该DPI，
+        降低DPI会更快但小字的识别率会下降）；所有坐标均换算到 dpi 下
+        """
+        with self._page_scope(page_num):
+            # 2. 低分辨率找候选区域，候选区域内按全分辨率检测红色标记
+            with self._stage('detect_red_marks') as info:
+                red_regions = self.detect_red_marks_roi(page, dpi)
+                info['marks'] = len(red_regions)
             print(f"检测到 {len(red_regions)} 个红色标记")
             
             # 3. 提取手写区域
-            handwriting_regions = self.extract_handwriting_regions(image, red_regions)
+            handwriting_regions = self.extract_handwriting_regions(_page_pixel_size(page, dpi), red_regions)
             
-            # 4. 识别手写月份
-            page_results = []
-            for hw_region in handwriting_regions:
-                x, y, w, h = hw_region['bbox']
-                region_img = image[y:y+h, x:x+w]
-                
-                month = self.recognize_month_text(region_img)
-                if month:
-                    print(f"识别到月份: {month}")
-                    page_results.append({
-                        'month': month,
-                        'type': hw_region['type'],
-                        'bbox': hw_region['bbox']
-                    })
+            # 项番/注番的印刷文字按全分辨率灰度识别（指定 roi_item_dpi 时按该DPI）
+            item_dpi = self.roi_item_dpi or dpi
+            with self._stage('render', dpi=item_dpi):
+                item_image = _render_page(page, item_dpi, colorspace='gray')
+            item_ocr = self._ocr_page(item_image)
+            if item_dpi != dpi:
+                item_ocr = _scale_ocr_result(item_ocr, dpi / item_dpi)
+            
+            # 4. 识别手写月份，手写区域按需裁剪渲染（灰度即可）
+            with self._stage('recognize_months', regions=len(handwriting_regions)):
+                page_results = self._recognize_regions(
+                    handwriting_regions, item_ocr if self.reuse_page_ocr else None,
+                    _ClipRenderer(page, [r['bbox'] for r in handwriting_regions], dpi))
             
-            # 5. 提取项番信息
-            items = self.extract_item_info(image, red_regions)
+            # 5. 提取项番信息（整页识别失败时按无结果处理）
+            with self._stage('extract_item_info'):
+                items = self.extract_item_info(
+                    item_image, red_regions,
+                    ocr_result=item_ocr if item_ocr is not None else [None],
+                    dpi=dpi)
             
-            all_results.append({
+            result = {
                 'page': page_num + 1,
                 'months': page_results,
                 'items': items
+            }
+        return self._attach_timing(result, page_num)
+
+    def _bind_page(self, page_num):
+        """
+        遥测中只标记当前线程处理的页（未启用遥测时不做任何事）
+        """
+        if self.telemetry is None:
+            return contextlib.nullcontext()
+        return self.telemetry.bind_page(page_num)
+
+    def _page_scope(self, page_num):
+        """
+        遥测中标记当前处理的页（未启用遥测时不做任何事）
+        """
+        if self.telemetry is None:
+            return contextlib.nullcontext({})
+        return self.telemetry.page(page_num)
+
+    def _attach_timing(self, result, page_num):
+        """
+        取出该页的阶段耗时，按需附加到页面结果中
+        """
+        if self.telemetry is not None:
+            timing = self.telemetry.pop_page_timing(page_num)
+            if self.include_timing:
+                result['timing'] = timing
+        return result
+
+    def _recognize_regions(self, handwriting_regions, page_ocr, crop, prepared=None):
+        """
+        识别各手写区域的月份，返回该页的月份结果列表
+        page_ocr: 整页OCR结果，有则先用与区域重叠的文字框解析
+        crop: crop(x, y, w, h) 返回该区域的图片
+        prepared: 已为全部区域预先增强、拼接好的图片（见 _prepare_month_batch），有则直接识别
+        """
+        if prepared is not None:
+            months = self._recognize_enhanced(*prepared)
+        else:
+            months = [None] * len(handwriting_regions)
+            if page_ocr and page_ocr[0]:
+                index = _BoxIndex(page_ocr[0])
+                for i, hw_region in enumerate(handwriting_regions):
+                    months[i] = self._month_from_lines(index.query(hw_region['bbox']))
+            
+            # 其余区域（整页结果中没有对应文字框的）分批单独识别
+            pending = [i for i, month in enumerate(months) if month is None]
+            region_imgs = [crop(*handwriting_regions[i]['bbox']) for i in pending]
+            for i, month in zip(pending, self.recognize_month_batch(region_imgs)):
+                months[i] = month
+        
+        page_results = []
+        for hw_region, month in zip(handwriting_regions, months):
+            if month:
+                print(f"识别到月份: {month}")
+                page_results.append({
+                    'month': month,
+                    'type': hw_region['type'],
+                    'bbox': hw_region['bbox']
+                })
+        return page_results
+
+    def _process_doc_page(self, page, page_num, dpi):
+        """
+        处理已打开文档中的一页（按配置选择整页或ROI模式）
+        """
+        if self.roi_detect_dpi:
+            return self.process_page_roi(page, page_num, dpi)
+        with self._stage('render', page=page_num, dpi=dpi):
+            image = _render_page(page, dpi)
+        return self.process_page(image, page_num, dpi)
+
+    @property
+    def ocr(self):
+        """
+        OCR引擎，第一次访问时才加载模型
+        """
+        if self._ocr is None:
+            self._ocr = get_shared_ocr(**self.ocr_options)
+        return self._ocr
+
+    @ocr.setter
+    def ocr(self, engine):
+        self._ocr = engine
+        self._engine_name = type(engine).__name__
+
+    def warm_up(self):
+        """
+        加载OCR模型并识别一张小图，返回耗时（毫秒）
+        """
+        start = time.perf_counter()
+        image = np.full((48, 160, 3), 255, dtype=np.uint8)
+        cv2.putText(image, '12', (10, 38), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+        self.ocr.ocr(image)
+        return (time.perf_counter() - start) * 1000
+
+    def open_cache(self, cache_path):
+        """
+        打开（或切换到）指定路径的OCR结果缓存
+        """
+        if self.cache is not None:
+            if self.cache.path == cache_path:
+                return self.cache
+            self.cache.close()
+        signature = json.dumps({
+            'paddleocr': _paddleocr_version(),
+            'engine': self._engine_name,
+            'options': self.ocr_options,
+        }, sort_keys=True)
+        self.cache = OCRResultCache(cache_path, self.cache_max_mb * 1024 * 1024, signature)
+        return self.cache
+
+    def _stage(self, name, **fields):
+        """
+        计时一个处理阶段（未启用遥测时不做任何事）
+        """
+        if self.telemetry is None:
+            return contextlib.nullcontext({})
+        return self.telemetry.stage(name, **fields)
+
+    def _run_ocr(self, image):
+        """
+        调用PaddleOCR；启用缓存时相同像素的图片直接返回缓存结果
+        """
+        with self._stage('ocr', shape=list(image.shape[:2])) as info:
+            if self.cache is None:
+                return self.ocr.ocr(image)
+            key = self.cache.make_key(image)
+            result = self.cache.get(key)
+            info['cached'] = result is not _CACHE_MISS
+            if result is _CACHE_MISS:
+                result = self.ocr.ocr(image)
+                self.cache.put(key, result)
+            return result
+
+    def _ocr_page(self, image):
+        """
+        整页OCR，失败时返回 None
+        """
+        try:
+            return self._run_ocr(image)
+        except Exception as e:
+            print(f"整页OCR识别错误: {e}")
+            return None
+
+    def worker_options(self):
+        """
+        多进程模式下重建处理器所需的构造参数
+        """
+        options = dict(self.ocr_options)
+        options['ocr_batch_size'] = self.ocr_batch_size
+        options['reuse_page_ocr'] = self.reuse_page_ocr
+        options['cache_path'] = self.cache.path if self.cache else None
+        options['cache_max_mb'] = self.cache_max_mb
+        options['red_prescale'] = self.red_prescale
+        options['roi_detect_dpi'] = self.roi_detect_dpi
+        options['roi_item_dpi'] = self.roi_item_dpi
+        # 工作进程只能把遥测追加写入同一个文件（回调无法跨进程），指定页的性能剖析也在工作进程中做
+        options['telemetry'] = self.telemetry.worker_options() if self.telemetry else None
+        options['include_timing'] = self.include_timing
+        options['preprocess'] = self.preprocessor.mode
+        options['preprocess_threads'] = self.preprocessor.threads
+        options['note_max_dx'] = self.note_max_dx
+        options['note_max_dy'] = self.note_max_dy
+        options['note_one_to_one'] = self.note_one_to_one
+        options['year'] = self.year
+        options['warm_up'] = self.warm_up_on_start
+        options['pipeline_threads'] = self.pipeline_threads
+        options['pipeline_depth'] = self.pipeline_depth
+        options['rec_fast_path'] = self.rec_fast_path
+        options['rec_min_confidence'] = self.rec_min_confidence
+        return options
+
+    def iter_results(self, pdf_path, dpi=300, prefetch=2, workers=1, pages=None):
+        """
+        逐页处理PDF，每处理完一页立即产出该页结果
+        workers > 1 时使用进程池并行处理，结果仍按页码顺序产出
+        pages: 只处理这些页码（None 表示全部）
+        """
+        if workers > 1:
+            yield from self._iter_results_parallel(pdf_path, dpi, workers, prefetch, pages)
+            return
+
+        if self.roi_detect_dpi:
+            # ROI模式按需渲染，不做整页预渲染
+            doc = fitz.open(pdf_path)
+            try:
+                for page_num in (range(len(doc)) if pages is None else pages):
+                    print(f"\n处理第 {page_num + 1} 页...")
+                    yield self.process_page_roi(doc[page_num], page_num, dpi)
+            finally:
+                doc.close()
+            return
+
+        if self.pipeline_threads > 0:
+            yield from self._iter_results_pipelined(pdf_path, dpi, prefetch, pages)
+            return
+
+        # 1. PDF逐页转图片（后台预渲染 prefetch 页）
+        for page_num, image in self.iter_pdf_pages(pdf_path, dpi, prefetch, pages=pages):
+            print(f"\n处理第 {page_num + 1} 页...")
+            result = self.process_page(image, page_num, dpi)
+            # 释放本页图片，避免整本PDF常驻内存
+            del image
+            yield result
+
+    def _iter_results_pipelined(self, pdf_path, dpi, prefetch, pages=None):
+        """
+        单进程流水线：渲染线程 -> 检测/预处理线程池 -> OCR（当前线程）
+        各级之间的在途页数有上限（渲染 prefetch 页，预处理 pipeline_depth 页），
+        OCR按页码顺序进行，结果与依次执行时相同
+        """
+        def prepare(page_num, image):
+            with self._bind_page(page_num):
+                return self._prepare_page(image)
+
+        rendered = self.iter_pdf_pages(pdf_path, dpi, prefetch, pages=pages)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.pipeline_threads,
+                                thread_name_prefix='pdf-prepare') as pool:
+            try:
+                for page_num, image in rendered:
+                    pending.append((page_num, image, pool.submit(prepare, page_num, image)))
+                    if len(pending) < max(self.pipeline_depth, 1):
+                        continue
+                    yield self._finish_pipelined(*pending.popleft(), dpi)
+                while pending:
+                    yield self._finish_pipelined(*pending.popleft(), dpi)
+            finally:
+                rendered.close()
+                for _, _, future in pending:
+                    future.cancel()
+
+    def _finish_pipelined(self, page_num, image, future, dpi=None):
+        print(f"\n处理第 {page_num + 1} 页...")
+        with self._page_scope(page_num):
+            result = self._finish_page(image, page_num, future.result(), dpi)
+        return self._attach_timing(result, page_num)
+
+    def _iter_results_parallel(self, pdf_path, dpi, workers, prefetch, pages=None):
+        """
+        进程池并行处理各页
+        每个工作进程只创建一次PaddleOCR，并自行渲染分配到的页面，
+        进程间只传递页码和精简的页面结果
+        """
+        if pages is None:
+            doc = fitz.open(pdf_path)
+            pages = range(len(doc))
+            doc.close()
+        page_nums = list(pages)
+        page_count = len(page_nums)
+        print(f"使用 {workers} 个工作进程处理 {page_count} 页")
+        self.worker_cache_stats = {}
+
+        # 在途任务数量有上限，保持流式输出和内存占用稳定
+        max_pending = workers + max(prefetch, 1)
+        if self.worker_pool is not None:
+            # 复用已打开的进程池，不再重新加载模型
+            pool = contextlib.nullcontext(self.worker_pool)
+        else:
+            pool = self._new_worker_pool(workers)
+        with pool as executor:
+            pending = {}
+            next_submit = 0
+            for index in range(page_count):
+                while next_submit < page_count and len(pending) < max_pending:
+                    pending[next_submit] = executor.submit(
+                        _process_page_in_worker, pdf_path, page_nums[next_submit], dpi)
+                    next_submit += 1
+                # 按页码顺序取结果，与串行处理的顺序一致
+                result, cache_stats = pending.pop(index).result()
+                for key, value in cache_stats.items():
+                    self.worker_cache_stats[key] = self.worker_cache_stats.get(key, 0) + value
+                yield result
+
+    def _new_worker_pool(self, workers):
+        # spawn避免fork继承主进程中的模型和线程状态
+        ctx = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                   initializer=_init_worker,
+                                   initargs=(self.worker_options(),))
+
+    def open_worker_pool(self, workers):
+        """
+        打开一个常驻的工作进程池，之后多次 process_pdf 共用
+        （批量处理时每个工作进程在整批中只加载一次模型）
+        """
+        self.close_worker_pool()
+        self.worker_pool = self._new_worker_pool(workers)
+        return self.worker_pool
+
+    def close_worker_pool(self):
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+
+    def _iter_checkpointed(self, pdf_path, dpi, prefetch, workers, checkpoint):
+        """
+        按页码顺序产出结果：断点中已有的页直接取出，其余页处理后追加写入断点
+        """
+        remaining = [n for n in range(checkpoint.page_count) if n not in checkpoint.done]
+        fresh = self.iter_results(pdf_path, dpi, prefetch, workers, pages=remaining)
+        try:
+            for page_num in range(checkpoint.page_count):
+                if page_num in checkpoint.done:
+                    yield checkpoint.done[page_num]
+                    continue
+                result = next(fresh)
+                checkpoint.add(page_num, result)
+                yield result
+        finally:
+            fresh.close()
+
+    def process_pdf(self, pdf_path, output_file=None, dpi=300, prefetch=2, workers=1,
+                    use_cache=False, checkpoint=False, resume=False,
+                    output_format=None, compact=False):
+        """
+        处理PDF文件的主函数
+        output_format: 'json'（缩进的JSON数组）或 'jsonl'（每页一行），None 时按扩展名推断
+        compact: 结果文件中 bbox 存为整数数组，并去掉调试字段（返回值不受影响）
+        use_cache: 在结果文件旁（未指定结果文件时在PDF旁）使用OCR结果缓存
+        checkpoint: 每处理完一页就追加写入断点文件（结果文件旁的 .checkpoint.jsonl），
+                    结果文件写完后删除断点文件
+        resume: 从断点文件继续，已完成的页不再处理（PDF内容、页数或DPI不同时从头处理）
+        """
+        print(f"开始处理PDF: {pdf_path}")
+        start = time.perf_counter()
+        
+        if use_cache and self.cache is None:
+            base = os.path.splitext(output_file or pdf_path)[0]
+            self.open_cache(base + '.ocr_cache.sqlite')
+        cache_before = self.cache.stats() if self.cache else None
+        self.worker_cache_stats = {}
+        
+        page_checkpoint = None
+        if checkpoint or resume:
+            page_checkpoint = PageCheckpoint(checkpoint_path(output_file or pdf_path),
+                                             pdf_path, dpi, resume)
+            if page_checkpoint.done:
+                print(f"从断点继续: 已完成 {len(page_checkpoint.done)}/{page_checkpoint.page_count} 页")
+            results = self._iter_checkpointed(pdf_path, dpi, prefetch, workers, page_checkpoint)
+        else:
+            results = self.iter_results(pdf_path, dpi, prefetch, workers)
+        
+        all_results = []
+        writer = ResultWriter(output_file, output_format, compact) if output_file else None
+        try:
+            for result in results:
+                # 每页处理完立即写入（临时文件）
+                if writer:
+                    writer.write(result)
+                all_results.append(result)
+        except BaseException:
+            # 出错或被中断时不生成结果文件，已完成的页保留在断点中
+            if writer:
+                writer.abort()
+            raise
+        else:
+            # 全部页写完后才替换为结果文件
+            if writer:
+                writer.close()
+        finally:
+            if page_checkpoint:
+                page_checkpoint.close()
+        print(f"\n共处理 {len(all_results)} 页")
+        
+        # 结果文件已完整写出，断点不再需要
+        if page_checkpoint and output_file:
+            os.remove(page_checkpoint.path)
+        
+        # 缓存命中统计（包括各工作进程）
+        if self.cache:
+            after = self.cache.stats()
+            hits = after['hits'] - cache_before['hits'] + self.worker_cache_stats.get('hits', 0)
+            misses = after['misses'] - cache_before['misses'] + self.worker_cache_stats.get('misses', 0)
+            total = hits + misses
+            rate = hits / total * 100 if total else 0.0
+            print(f"OCR缓存: 命中 {hits} 次, 未命中 {misses} 次 (命中率 {rate:.1f}%)")
+        
+        # 遥测：整份文档的汇总（并行时各阶段明细在工作进程写入的文件中）
+        if self.telemetry:
+            summary = self.telemetry.summary()
+            self.telemetry.emit({
+                'event': 'document',
+                'pdf': pdf_path,
+                'pages': len(all_results),
+                'wall_ms': (time.perf_counter() - start) * 1000,
+                'stages': summary,
             })
+            if summary:
+                slowest = sorted(summary.items(), key=lambda kv: kv[1]['wall_ms'], reverse=True)
+                print("耗时最多的阶段: " + ", ".join(
+                    f"{name} {total['wall_ms'] / 1000:.2f}s" for name, total in slowest[:5]))
         
         # 保存结果
         if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(all_results, f, ensure_ascii=False, indent=2)
             print(f"\n结果已保存到: {output_file}")
         
         return all_results
 
+# 工作进程内的处理器和当前打开的PDF（每个进程各一份）
+_worker_processor = None
+_worker_doc = None
+_worker_doc_path = None
+
+def _init_worker(options):
+    """
+    工作进程初始化：每个进程只加载一次OCR模型
+    """
+    global _worker_processor
+    _worker_processor = PDFHandwritingOCR(**options)
+
+def _worker_ready():
+    """
+    空任务：提交后促使进程池启动工作进程（并完成模型加载），返回进程号
+    """
+    return os.getpid()
+
+def _process_page_in_worker(pdf_path, page_num, dpi):
+    """
+    在工作进程中渲染并处理一页，返回该页结果
+    """
+    global _worker_doc, _worker_doc_path
+    if _worker_doc_path != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = fitz.open(pdf_path)
+        _worker_doc_path = pdf_path
+    
+    print(f"\n处理第 {page_num + 1} 页... (进程 {os.getpid()})")
+    cache = _worker_processor.cache
+    before = cache.stats() if cache else None
+    result = _worker_processor._process_doc_page(_worker_doc[page_num], page_num, dpi)
+    
+    # 把本页的缓存命中情况一并返回给主进程汇总
+    cache_stats = {}
+    if cache:
+        after = cache.stats()
+        cache_stats = {key: after[key] - before[key] for key in ('hits', 'misses')}
+    return result, cache_stats
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PageCheckpoint:
+    """
+    逐页追加写入的断点文件（JSON-lines）
+    第一行记录PDF的哈希、页数和DPI，之后每行是一页的结果
+    """
+    VERSION = 1
+
+    def __init__(self, path, pdf_path, dpi, resume=False):
+        self.path = path
+        doc = fitz.open(pdf_path)
+        self.page_count = len(doc)
+        doc.close()
+        self.header = {
+            'checkpoint': self.VERSION,
+            'pdf_sha256': _file_sha256(pdf_path),
+            'pages': self.page_count,
+            'dpi': dpi,
+        }
+        # 页码 -> 该页结果
+        self.done = {}
+        valid_bytes = self._load() if resume and os.path.exists(path) else 0
+        if valid_bytes:
+            # 去掉被中断时写了一半的最后一行，从其后继续追加
+            self.file = open(path, 'r+b')
+            self.file.truncate(valid_bytes)
+            self.file.seek(valid_bytes)
+        else:
+            self.done = {}
+            self.file = open(path, 'wb')
+            self._append(self.header)
+
+    def _load(self):
+        """
+        读取已有断点，返回有效内容的字节数（与当前PDF不一致时返回 0）
+        """
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for index, line in enumerate(f):
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if index == 0:
+                    if record != self.header:
+                        print("断点文件与当前PDF不一致（内容、页数或DPI不同），从头处理")
+                        return 0
+                else:
+                    self.done[record['page_index']] = record['result']
+                valid_bytes += len(line)
+        return valid_bytes
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def add(self, page_num, result):
+        self._append({'page_index': page_num, 'result': result})
+        self.done[page_num] = result
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+BATCH_MANIFEST = 'batch_manifest.json'
+
+def find_pdfs(in_dir):
+    """
+    递归查找目录下的所有PDF文件（按路径排序）
+    """
+    pdf_files = []
+    for dirpath, dirnames, filenames in os.walk(in_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith('.pdf'):
+                pdf_files.append(os.path.join(dirpath, filename))
+    return pdf_files
+
+def batch_output_path(pdf_path, in_dir, out_dir, output_format=JSON):
+    """
+    结果文件路径：在输出目录下保持与输入目录相同的子目录结构
+    """
+    rel = os.path.relpath(pdf_path, in_dir)
+    return os.path.join(out_dir, f"{os.path.splitext(rel)[0]}_识别结果.{output_format}")
+
+def checkpoint_path(output_file):
+    """
+    结果文件对应的断点文件路径（结果文件旁的 .checkpoint.jsonl）
+    """
+    return os.path.splitext(output_file)[0] + '.checkpoint.jsonl'
+
+def is_complete(output_file, pdf_path):
+    """
+    结果文件是否已完整写出：结果文件只在全部页写完后才替换到位，
+    还有断点文件说明上次处理被中断（结果文件可能是更早的不完整版本）
+    """
+    return (os.path.exists(output_file) and not os.path.exists(checkpoint_path(output_file))
+            and os.path.getmtime(output_file) > os.path.getmtime(pdf_path))
+
+def _write_manifest(path, manifest):
+    # 先写临时文件再替换，中途中断时不会留下半个清单
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def process_batch(in_dir, out_dir, workers=1, dpi=300, force=False, use_cache=False,
+                  processor=None, resume=False, output_format=JSON, compact=False):
+    """
+    批量处理目录（含子目录）下的所有PDF，不需要任何交互
+    每份PDF写一个结果文件，并在输出目录写入运行清单（每个文件的状态和耗时）；
+    已完整写出且比PDF新的结果文件自动跳过（force=True 时全部重新处理），
+    留有断点文件的（上次被中断）重新处理
+    resume: 每页写断点，被中断的文件下次从断点继续
+    output_format / compact: 结果文件格式，见 ResultWriter
+    """
+    pdf_files = find_pdfs(in_dir)
+    print(f"在 {in_dir} 中找到 {len(pdf_files)} 个PDF文件")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, BATCH_MANIFEST)
+    manifest = {
+        'in_dir': os.path.abspath(in_dir),
+        'out_dir': os.path.abspath(out_dir),
+        'workers': workers,
+        'dpi': dpi,
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'finished': None,
+        'counts': {'ok': 0, 'skipped': 0, 'failed': 0},
+        'files': [],
+    }
+    
+    # 整批只创建一个处理器（和一个进程池），模型只加载一次
+    if processor is None:
+        processor = PDFHandwritingOCR()
+    if use_cache:
+        # 整批共用输出目录下的一个缓存（须在创建进程池之前打开，工作进程才会使用）
+        processor.open_cache(os.path.join(out_dir, 'ocr_cache.sqlite'))
+    if workers > 1:
+        processor.open_worker_pool(workers)
+    try:
+        for index, pdf_path in enumerate(pdf_files, 1):
+            output_file = batch_output_path(pdf_path, in_dir, out_dir, output_format)
+            entry = {
+                'pdf': os.path.relpath(pdf_path, in_dir),
+                'output': os.path.relpath(output_file, out_dir),
+            }
+            print(f"\n[{index}/{len(pdf_files)}] {entry['pdf']}")
+            
+            if not force and is_complete(output_file, pdf_path):
+                print("结果文件比PDF新，跳过")
+                entry['status'] = 'skipped'
+            else:
+                start = time.perf_counter()
+                try:
+                    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                    results = processor.process_pdf(pdf_path, output_file, dpi=dpi,
+                                                    workers=workers, checkpoint=resume,
+                                                    resume=resume, output_format=output_format,
+                                                    compact=compact)
+                    entry['status'] = 'ok'
+                    entry['pages'] = len(results)
+                except Exception as e:
+                    print(f"❌ 处理失败: {e}")
+                    entry['status'] = 'failed'
+                    entry['error'] = f"{type(e).__name__}: {e}"
+                    # 结果文件是原子写入的，失败时保留上次完整的结果
+                entry['seconds'] = round(time.perf_counter() - start, 3)
+            
+            manifest['counts'][entry['status']] += 1
+            manifest['files'].append(entry)
+            # 每处理完一个文件就更新清单，中途中断也能看到进度
+            _write_manifest(manifest_path, manifest)
+    finally:
+        processor.close_worker_pool()
+    
+    manifest['finished'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    _write_manifest(manifest_path, manifest)
+    counts = manifest['counts']
+    print(f"\n批量处理完成: 成功 {counts['ok']}, 跳过 {counts['skipped']}, 失败 {counts['failed']}")
+    print(f"运行清单: {manifest_path}")
+    return manifest
+
+def batch_main(argv):
+    """
+    命令行批量模式: python pdf_ocr.py batch <输入目录> <输出目录> [--workers N]
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog='pdf_ocr.py batch',
+                                     description="批量识别目录下的所有PDF（无界面）")
+    parser.add_argument('in_dir', help="输入目录（递归查找PDF）")
+    parser.add_argument('out_dir', help="结果保存目录")
+    parser.add_argument('--workers', type=int, default=1, help="工作进程数")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--force', action='store_true', help="已有较新的结果文件时也重新处理")
+    parser.add_argument('--cache', action='store_true', help="在输出目录使用整批共享的OCR结果缓存")
+    parser.add_argument('--resume', action='store_true', help="逐页写断点，从上次中断的页继续")
+    parser.add_argument('--format', choices=[JSON, JSONL], default=JSON,
+                        help="结果文件格式（jsonl 为每页一行）")
+    parser.add_argument('--compact', action='store_true', help="bbox存为整数数组并去掉调试字段")
+    args = parser.parse_args(argv)
+    
+    if not os.path.isdir(args.in_dir):
+        print(f"输入目录不存在: {args.in_dir}")
+        return 2
+    manifest = process_batch(args.in_dir, args.out_dir, args.workers, args.dpi,
+                             args.force, args.cache, resume=args.resume,
+                             output_format=args.format, compact=args.compact)
+    return 1 if manifest['counts']['failed'] else 0
+
 def select_pdf_file():
     """
     打开文件选择器，让用户选择PDF文件
     """
+    # 界面模块只在交互模式下导入，批量模式可在无图形界面的机器上运行
+    import tkinter as tk
+    from tkinter import filedialog
+    
     # 创建一个隐藏的根窗口
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
@@ -423,6 +2098,9 @@ def select_output_folder():
     """
     选择结果保存文件夹
     """
+    import tkinter as tk
+    from tkinter import filedialog
+    
     root = tk.Tk()
     root.withdraw()
     
@@ -512,6 +2190,9 @@ def main():
         
         # 6. 询问是否打开结果文件
         try:
+            import tkinter as tk
+            from tkinter import messagebox
+            
             root = tk.Tk()
             root.withdraw()
             
@@ -578,30 +2259,25 @@ def quick_test():
     main()
 
 if __name__ == "__main__":
-    # 安装依赖检查
-    try:
-        import fitz
-        print("✓ PyMuPDF 已安装")
-    except ImportError:
+    # 安装依赖检查（只查找模块，不导入也不加载模型；模型在第一次识别时加载）
+    import importlib.util
+    if importlib.util.find_spec('fitz') is None:
         print("❌ 需要安装 PyMuPDF: pip install PyMuPDF")
         exit(1)
+    print("✓ PyMuPDF 已安装")
     
-    try:
-        import paddleocr
-        # 测试基础功能
-        test_ocr = paddleocr.PaddleOCR(lang='ch')  # 删除show_log参数
-        print("✓ PaddleOCR 初始化成功")
-    except ImportError:
+    if importlib.util.find_spec('paddleocr') is None:
         print("❌ 需要安装 PaddleOCR: pip install paddlepaddle paddleocr")
         exit(1)
-    except Exception as e:
-        print(f"❌ PaddleOCR 初始化失败: {e}")
-        exit(1)
+    print("✓ PaddleOCR 已安装")
     
     # 检查运行模式
     import sys
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--quick":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # 批量模式 - 无交互，适合定时任务
+        sys.exit(batch_main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--quick":
         # 快速测试模式
         quick_test()
     else:
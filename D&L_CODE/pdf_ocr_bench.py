@@ -0,0 +1,533 @@
+"""
+pdf_ocr 性能基准测试
+
+用法:
+    python pdf_ocr_bench.py pixmap [PDF文件] [--dpi 300] [--repeat 3]
+    python pdf_ocr_bench.py stages [--pdf PDF文件 ...] [--synthetic-pages 3]
+                                   [--circles 20] [--crosses 5] [--labels 40]
+                                   [--stub-ocr] [--stub-latency-ms 0] [--json 结果.json]
+                                   [--pipeline-threads 0] [--pipeline-depth 2] [--rec-fast-path]
+    python pdf_ocr_bench.py tokens [--lines 2000] [--repeat 20]
+    python pdf_ocr_bench.py startup [PDF文件] [--dpi 300] [--repeat 3]
+    python pdf_ocr_bench.py output [--pages 2000] [--items 40]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from ocr_output import JSON, JSONL, ResultWriter, read_results
+from ocr_tokens import JS_ITEM, NOTE, TokenClassifier
+from pdf_ocr import (PDFHandwritingOCR, _FITZ_COLORSPACES, _pixmap_to_array,
+                     _pixmap_to_array_png, _render_page)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PDF = os.path.join(HERE, 'test_document.pdf')
+BUNDLED_PDFS = [
+    os.path.join(HERE, '..', 'test_data.pdf'),
+    os.path.join(HERE, 'test_document.pdf'),
+]
+
+
+def bench_pixmap(pdf_path, dpi=300, repeat=3):
+    """
+    比较pixmap转OpenCV图片的各条路径：
+    PNG编码/解码（旧） vs 原始缓冲直接转换（BGR / 灰度）
+    """
+    cases = [
+        ('png 编码/解码 (bgr)', 'bgr', _pixmap_to_array_png),
+        ('原始缓冲 (bgr)', 'bgr', _pixmap_to_array),
+        ('png 编码/解码 (gray)', 'gray', _pixmap_to_array_png),
+        ('原始缓冲 (gray)', 'gray', _pixmap_to_array),
+    ]
+    mat = fitz.Matrix(dpi/72, dpi/72)
+    doc = fitz.open(pdf_path)
+    results = {}
+    try:
+        print(f"PDF: {pdf_path} ({len(doc)} 页, {dpi} DPI, 重复 {repeat} 次)")
+        for name, colorspace, convert in cases:
+            render_time = 0.0
+            convert_time = 0.0
+            for _ in range(repeat):
+                for page in doc:
+                    t0 = time.perf_counter()
+                    pix = page.get_pixmap(matrix=mat, colorspace=_FITZ_COLORSPACES[colorspace], alpha=False)
+                    t1 = time.perf_counter()
+                    img = convert(pix)
+                    t2 = time.perf_counter()
+                    render_time += t1 - t0
+                    convert_time += t2 - t1
+                    del pix, img
+            pages = len(doc) * repeat
+            results[name] = convert_time / pages
+            print(f"{name:<22} 渲染 {render_time / pages * 1000:8.1f} ms/页"
+                  f"  转换 {convert_time / pages * 1000:8.1f} ms/页")
+
+        # 两条路径的结果必须一致
+        for colorspace in ('bgr', 'gray'):
+            pix = doc[0].get_pixmap(matrix=mat, colorspace=_FITZ_COLORSPACES[colorspace], alpha=False)
+            assert np.array_equal(_pixmap_to_array(pix), _pixmap_to_array_png(pix)), colorspace
+    finally:
+        doc.close()
+
+    speedup = results['png 编码/解码 (bgr)'] / max(results['原始缓冲 (bgr)'], 1e-9)
+    print(f"\n转换加速比 (bgr): {speedup:.1f}x")
+    return results
+
+
+class StubOCR:
+    """
+    桩OCR引擎：不加载模型，按固定规则返回与PaddleOCR相同结构的结果，
+    用于只测量CPU上的图像处理阶段
+    页面大小的图片返回 page_lines；较小的图片（手写区域/拼接图）返回一个月份；
+    det=False（只识别）时每张图返回一个月份，模拟耗时按 1/rec_speedup 计
+    """
+    def __init__(self, page_lines=None, latency_ms=0.0, page_min_side=1000, rec_speedup=8.0):
+        self.page_lines = page_lines or []
+        self.latency = latency_ms / 1000
+        self.page_min_side = page_min_side
+        self.rec_speedup = rec_speedup
+        self.calls = 0
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        self.calls += 1
+        if not det:
+            images = img if isinstance(img, list) else [img]
+            if self.latency:
+                time.sleep(self.latency / self.rec_speedup)
+            return [[('3月', 0.9) for _ in images]]
+        if self.latency:
+            time.sleep(self.latency)
+        h, w = img.shape[:2]
+        if min(h, w) >= self.page_min_side:
+            return [list(self.page_lines)]
+        return [[[[[0, 0], [w, 0], [w, h], [0, h]], ('3月', 0.9)]]]
+
+
+def make_synthetic_pdf(path, pages=3, circles=20, crosses=5, labels=40, seed=0, dpi=300):
+    """
+    生成带红色圆圈、×和注番/JS项番文字的合成PDF（A4，每页布局相同）
+    返回按 dpi 换算的文字框列表，可直接作为 StubOCR 的 page_lines
+    """
+    rng = random.Random(seed)
+    width, height = 595, 842
+    zoom = dpi / 72
+    fontsize = 9
+
+    marks = []
+    for _ in range(circles):
+        marks.append(('circle', rng.uniform(40, width - 40), rng.uniform(40, height - 40),
+                      rng.randint(1, 12)))
+    for _ in range(crosses):
+        marks.append(('cross', rng.uniform(40, width - 40), rng.uniform(40, height - 40), 0))
+
+    texts = []
+    for i in range(labels):
+        x = rng.uniform(20, width - 80)
+        y = rng.uniform(30, height - 30)
+        texts.append((f"{rng.choice('HJRT')}A{rng.randint(10000, 99999)}", x, y))
+        texts.append((f"JS{i:04d}", x + rng.uniform(-5, 5), y + 14))
+
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=width, height=height)
+        for kind, x, y, month in marks:
+            if kind == 'circle':
+                page.draw_circle((x, y), 14, color=(1, 0, 0), width=1.5)
+                page.insert_text((x - 9, y + 4), f"{month}月", fontname='japan', fontsize=fontsize)
+            else:
+                page.draw_line((x - 10, y - 10), (x + 10, y + 10), color=(1, 0, 0), width=1.5)
+                page.draw_line((x + 10, y - 10), (x - 10, y + 10), color=(1, 0, 0), width=1.5)
+        for text, x, y in texts:
+            page.insert_text((x, y), text, fontsize=fontsize)
+    doc.save(path)
+    doc.close()
+
+    page_lines = []
+    for text, x, y in texts:
+        x1, y1 = x * zoom, (y - fontsize) * zoom
+        x2, y2 = (x + len(text) * fontsize * 0.6) * zoom, y * zoom
+        page_lines.append([[[x1, y1], [x2, y1], [x2, y2], [x1, y2]], (text, 0.95)])
+    return page_lines
+
+
+def peak_rss_mb():
+    """
+    当前进程的峰值常驻内存（MB），无法获取时返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20  # Windows
+        except (ImportError, AttributeError):
+            return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 1024
+
+
+def bench_stages(processor, pdf_paths, dpi=300):
+    """
+    分别计时各处理阶段，再计时端到端的 process_pdf
+    返回 {'stages': {阶段: [秒, ...]}, 'end_to_end': [...], 'peak_rss_mb': ...}
+    """
+    timings = defaultdict(list)
+
+    def timed(stage, func, *args):
+        t0 = time.perf_counter()
+        result = func(*args)
+        timings[stage].append(time.perf_counter() - t0)
+        return result
+
+    end_to_end = []
+    # 各阶段会打印进度信息，计时期间不输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        for pdf_path in pdf_paths:
+            doc = fitz.open(pdf_path)
+            for page in doc:
+                image = timed('pdf_to_images', _render_page, page, dpi)
+                red_regions = timed('detect_red_marks', processor.detect_red_marks, image)
+                for hw_region in processor.extract_handwriting_regions(image, red_regions):
+                    x, y, w, h = hw_region['bbox']
+                    crop = image[y:y+h, x:x+w]
+                    timed('enhance_handwriting_image', processor.enhance_handwriting_image, crop)
+                    timed('recognize_month_text', processor.recognize_month_text, crop)
+                items = timed('extract_item_info', processor.extract_item_info, image, red_regions)
+                timed('match_notes_to_items', processor.match_notes_to_items,
+                      items['all_potential_notes'], items['js_items'])
+            page_count = len(doc)
+            doc.close()
+
+            t0 = time.perf_counter()
+            processor.process_pdf(pdf_path, dpi=dpi)
+            end_to_end.append({
+                'pdf': os.path.basename(pdf_path),
+                'pages': page_count,
+                'seconds': time.perf_counter() - t0,
+            })
+
+    return {'stages': dict(timings), 'end_to_end': end_to_end, 'peak_rss_mb': peak_rss_mb()}
+
+
+def report_stages(results):
+    """
+    打印各阶段 p50/p95 延迟、端到端吞吐量和峰值内存，返回汇总字典
+    """
+    summary = {'stages': {}, 'end_to_end': results['end_to_end'],
+               'peak_rss_mb': results['peak_rss_mb']}
+    print(f"{'阶段':<28}{'次数':>6}{'p50 ms':>10}{'p95 ms':>10}{'合计 s':>10}")
+    for stage, values in results['stages'].items():
+        arr = np.array(values) * 1000
+        stats = {
+            'calls': len(values),
+            'p50_ms': float(np.percentile(arr, 50)),
+            'p95_ms': float(np.percentile(arr, 95)),
+            'total_s': float(arr.sum() / 1000),
+        }
+        summary['stages'][stage] = stats
+        print(f"{stage:<28}{stats['calls']:>6}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['total_s']:>10.2f}")
+
+    print()
+    for run in results['end_to_end']:
+        rate = run['pages'] / run['seconds'] if run['seconds'] else 0.0
+        run['pages_per_sec'] = rate
+        print(f"process_pdf {run['pdf']}: {run['pages']} 页, {run['seconds']:.2f} s, {rate:.2f} 页/秒")
+    if results['peak_rss_mb'] is not None:
+        print(f"峰值内存: {results['peak_rss_mb']:.0f} MB")
+    return summary
+
+
+def synthetic_page_results(pages=2000, items=40, seed=0):
+    """
+    生成与 process_page 结构相同的合成页面结果
+    """
+    rng = random.Random(seed)
+
+    def line(kind, text):
+        x, y = rng.uniform(0, 2300), rng.uniform(0, 3300)
+        w, h = rng.uniform(80, 200), rng.uniform(20, 40)
+        return {
+            'type': kind, 'text': text,
+            'bbox': [[x, y], [x + w, y], [x + w, y + h], [x, y + h]],
+            'center_y': y + h / 2, 'center_x': x + w / 2,
+            'confidence': rng.uniform(0.8, 1.0),
+        }
+
+    results = []
+    for page in range(pages):
+        js_items = [line('item_number', f"JS-{i:03d}") for i in range(items)]
+        notes = [line('potential_note', f"HA{rng.randint(10000, 99999)}") for _ in range(items)]
+        pairs = [{'note_number': n['text'], 'item_number': j['text'],
+                  'note_bbox': n['bbox'], 'item_bbox': j['bbox']}
+                 for n, j in zip(notes, js_items)]
+        months = [{'month': f"2025-{rng.randint(1, 12):02d}", 'type': 'circle',
+                   'bbox': (rng.randint(0, 2300), rng.randint(0, 3300), 120, 80)}
+                  for _ in range(items // 2)]
+        results.append({'page': page + 1, 'months': months,
+                        'items': {'js_items': js_items, 'note_numbers': pairs,
+                                  'all_potential_notes': notes}})
+    return results
+
+
+def bench_output(pages=2000, items=40):
+    """
+    结果文件写出/读取：改写前（整体 json.dump）vs 逐页 JSON / JSON-lines / 紧凑模式
+    """
+    results = synthetic_page_results(pages, items)
+    print(f"{pages} 页，每页 {items} 个项番")
+    print(f"{'方式':<22} {'写出':>9} {'读取':>9} {'大小':>10}")
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [
+            ('json.dump(indent=2)', None, False),
+            ('json', JSON, False),
+            ('json --compact', JSON, True),
+            ('jsonl', JSONL, False),
+            ('jsonl --compact', JSONL, True),
+        ]
+        for name, fmt, compact in variants:
+            path = os.path.join(tmp, f"out.{fmt or JSON}")
+            start = time.perf_counter()
+            if fmt is None:
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+            else:
+                with ResultWriter(path, fmt, compact) as writer:
+                    for result in results:
+                        writer.write(result)
+            write_s = time.perf_counter() - start
+            start = time.perf_counter()
+            read_results(path)
+            read_s = time.perf_counter() - start
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            rows[name] = {'write_s': write_s, 'read_s': read_s, 'size_mb': size_mb}
+            print(f"{name:<22} {write_s:8.2f}s {read_s:8.2f}s {size_mb:8.1f}MB")
+    return rows
+
+
+# 分类器改写前的实现，仅用于对比
+_LEGACY_MONTH_MAPPING = {}
+for _num, _kanji in enumerate(['一', '二', '三', '四', '五', '六', '七', '八', '九', '十', '十一', '十二'], 1):
+    for _text in (f"{_num}月", f"{str(_num).translate(str.maketrans('0123456789', '０１２３４５６７８９'))}月", f"{_kanji}月"):
+        _LEGACY_MONTH_MAPPING[_text] = f"2025-{_num:02d}"
+
+
+def _legacy_parse_month(text):
+    text = text.strip()
+    if text in _LEGACY_MONTH_MAPPING:
+        return _LEGACY_MONTH_MAPPING[text]
+    for month_text, standard_format in _LEGACY_MONTH_MAPPING.items():
+        if month_text in text or text in month_text:
+            return standard_format
+    numbers = re.findall(r'\d+', text)
+    if numbers:
+        month_num = int(numbers[0])
+        if 1 <= month_num <= 12:
+            return f"2025-{month_num:02d}"
+    return None
+
+
+def _legacy_is_potential_note_number(text):
+    text = text.strip().replace(' ', '')
+    patterns = [
+        r'^[A-Z]{1,3}\d{4,6}$',
+        r'^[A-Z]\d{6}$',
+        r'^[A-Z]{2}\d{5}$',
+    ]
+    for pattern in patterns:
+        if re.match(pattern, text) and not text.startswith('JS'):
+            return True
+    return False
+
+
+def _legacy_classify(text):
+    text = text.strip()
+    if text.startswith('JS'):
+        return JS_ITEM, _legacy_parse_month(text)
+    if _legacy_is_potential_note_number(text):
+        return NOTE, _legacy_parse_month(text)
+    return None, _legacy_parse_month(text)
+
+
+def bench_tokens(lines=2000, repeat=20, seed=0):
+    """
+    OCR文字行分类：改写前的 parse_month/is_potential_note_number vs TokenClassifier
+    （每行都做月份解析和项番/注番判断，与 extract_item_info + 月份识别的用法一致）
+    """
+    rng = random.Random(seed)
+    kanji = ['一', '二', '三', '四', '五', '六', '七', '八', '九', '十', '十一', '十二']
+    samples = []
+    for _ in range(lines):
+        kind = rng.random()
+        if kind < 0.25:
+            samples.append(f"JS{rng.randint(0, 9999):04d}")
+        elif kind < 0.5:
+            samples.append(f"{rng.choice(['HA', 'JA', 'RA', 'T'])}{rng.randint(10000, 999999)}")
+        elif kind < 0.7:
+            month = rng.randint(1, 12)
+            samples.append(rng.choice([f"{month}月", f"{kanji[month - 1]}月", f"{month}月分"]))
+        else:
+            samples.append(rng.choice(['数量', '品名', '備考', '納期', '合計', 'No.', '2025/05/01']))
+
+    def run(func):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for text in samples:
+                func(text)
+        return (time.perf_counter() - t0) / (repeat * len(samples)) * 1e6
+
+    legacy = run(_legacy_classify)
+    uncached = TokenClassifier(cache_size=0)
+    no_cache = run(uncached.classify)
+    cached = TokenClassifier()
+    with_cache = run(cached.classify)
+
+    print(f"{len(samples)} 行 x {repeat} 次（不同文字 {len(set(samples))} 种）")
+    print(f"改写前            {legacy:8.2f} us/行")
+    print(f"分类器（无缓存）  {no_cache:8.2f} us/行  ({legacy / no_cache:.1f}x)")
+    print(f"分类器（LRU缓存） {with_cache:8.2f} us/行  ({legacy / with_cache:.1f}x)")
+    return {'legacy_us': legacy, 'uncached_us': no_cache, 'cached_us': with_cache}
+
+
+# 在新进程中测量启动耗时，输出一行JSON
+#   legacy: 改写前的启动方式（__main__ 先试加载一个模型，构造处理器时再加载一次）
+#   lazy:   第一次识别时才加载共享模型
+#   warm:   构造处理器时预热模型
+_STARTUP_SCRIPT = r"""
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+mode, pdf_path, dpi = sys.argv[1], sys.argv[2], int(sys.argv[3])
+import pdf_ocr
+timing = {'import_ms': (time.perf_counter() - start) * 1000}
+with contextlib.redirect_stdout(io.StringIO()):
+    if mode == 'legacy':
+        import paddleocr
+        paddleocr.PaddleOCR(lang='ch')
+        processor = pdf_ocr.PDFHandwritingOCR()
+        processor.ocr
+    else:
+        processor = pdf_ocr.PDFHandwritingOCR(warm_up=(mode == 'warm'))
+    timing['ready_ms'] = (time.perf_counter() - start) * 1000
+    next(processor.iter_results(pdf_path, dpi))
+timing['first_page_ms'] = (time.perf_counter() - start) * 1000
+print(json.dumps(timing))
+"""
+
+
+def bench_startup(pdf_path, dpi=300, repeat=3, modes=('legacy', 'lazy', 'warm')):
+    """
+    启动到第一页结果的耗时（每次都在新进程中冷启动）
+    """
+    print(f"PDF: {pdf_path}  dpi={dpi}  重复 {repeat} 次（取中位数）")
+    print(f"{'模式':<8} {'导入':>10} {'可用':>10} {'第一页':>10}")
+    results = {}
+    for mode in modes:
+        runs = []
+        for _ in range(repeat):
+            proc = subprocess.run(
+                [sys.executable, '-c', _STARTUP_SCRIPT, mode, pdf_path, str(dpi)],
+                cwd=HERE, capture_output=True, text=True, encoding='utf-8')
+            if proc.returncode != 0:
+                raise RuntimeError(f"{mode} 启动失败:\n{proc.stderr}")
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        row = results[mode]
+        print(f"{mode:<8} {row['import_ms']:8.0f}ms {row['ready_ms']:8.0f}ms "
+              f"{row['first_page_ms']:8.0f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pdf_ocr 性能基准测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('pixmap', help="pixmap转图片：PNG往返 vs 原始缓冲")
+    p.add_argument('pdf', nargs='?', default=DEFAULT_PDF)
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('--repeat', type=int, default=3)
+
+    p = sub.add_parser('stages', help="各处理阶段及端到端耗时")
+    p.add_argument('--pdf', action='append', help="要测试的PDF（可多次指定，默认使用自带的测试PDF）")
+    p.add_argument('--no-bundled', action='store_true', help="不测试自带的测试PDF")
+    p.add_argument('--synthetic-pages', type=int, default=3, help="合成PDF页数（0 表示不生成）")
+    p.add_argument('--circles', type=int, default=20, help="每页红色圆圈数")
+    p.add_argument('--crosses', type=int, default=5, help="每页红色×数")
+    p.add_argument('--labels', type=int, default=40, help="每页注番/JS项番对数")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--stub-ocr', action='store_true', help="使用桩OCR引擎（不需要模型）")
+    p.add_argument('--stub-latency-ms', type=float, default=0.0, help="桩引擎每次调用的模拟耗时")
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('--json', help="把汇总结果写入JSON文件")
+    p.add_argument('--pipeline-threads', type=int, default=0,
+                   help="端到端计时使用单进程流水线的检测/预处理线程数（0 表示依次执行）")
+    p.add_argument('--pipeline-depth', type=int, default=2)
+    p.add_argument('--rec-fast-path', action='store_true', help="手写月份使用识别快速通道")
+
+    p = sub.add_parser('tokens', help="OCR文字行分类：改写前 vs TokenClassifier")
+    p.add_argument('--lines', type=int, default=2000)
+    p.add_argument('--repeat', type=int, default=20)
+
+    p = sub.add_parser('startup', help="冷启动到第一页结果的耗时：改写前 vs 延迟加载 vs 预热")
+    p.add_argument('pdf', nargs='?', default=DEFAULT_PDF)
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('--repeat', type=int, default=3)
+
+    p = sub.add_parser('output', help="结果文件写出：JSON vs JSON-lines vs 紧凑模式")
+    p.add_argument('--pages', type=int, default=2000)
+    p.add_argument('--items', type=int, default=40, help="每页项番数")
+
+    args = parser.parse_args()
+    if args.command == 'pixmap':
+        bench_pixmap(args.pdf, args.dpi, args.repeat)
+    elif args.command == 'output':
+        bench_output(args.pages, args.items)
+    elif args.command == 'startup':
+        bench_startup(os.path.abspath(args.pdf), args.dpi, args.repeat)
+    elif args.command == 'tokens':
+        bench_tokens(args.lines, args.repeat)
+    elif args.command == 'stages':
+        pdf_paths = list(args.pdf or [])
+        if not args.no_bundled:
+            pdf_paths += [p for p in BUNDLED_PDFS if os.path.exists(p)]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            page_lines = []
+            if args.synthetic_pages > 0:
+                synthetic = os.path.join(tmp, 'synthetic.pdf')
+                page_lines = make_synthetic_pdf(
+                    synthetic, args.synthetic_pages, args.circles, args.crosses,
+                    args.labels, args.seed, args.dpi)
+                pdf_paths.append(synthetic)
+            
+            pipeline = {'pipeline_threads': args.pipeline_threads,
+                        'pipeline_depth': args.pipeline_depth,
+                        'rec_fast_path': args.rec_fast_path}
+            if args.stub_ocr:
+                processor = PDFHandwritingOCR(
+                    ocr_engine=StubOCR(page_lines, args.stub_latency_ms), **pipeline)
+            else:
+                processor = PDFHandwritingOCR(**pipeline)
+            summary = report_stages(bench_stages(processor, pdf_paths, args.dpi))
+        
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+pdf_ocr 常驻服务
+
+启动后只加载一次OCR模型（工作进程在启动时完成加载和预热），
+之后每份PDF只需要识别本身的时间。通过本机HTTP提供服务：
+
+    POST /process   {"pdf_path": ..., "output_file": ..., "dpi": 300,
+                     "output_format": "json"|"jsonl", "compact": false}  -> {"results": [...]}
+    GET  /health    服务状态
+    GET  /metrics   请求数、排队数、耗时等统计
+
+用法:
+    python pdf_ocr_server.py serve [--host 127.0.0.1] [--port 8765] [--workers 2]
+                                   [--max-queue 8] [--cache 缓存.sqlite]
+    python pdf_ocr_server.py process PDF文件 [-o 结果.json] [--dpi 300]
+    python pdf_ocr_server.py health | metrics
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+from pdf_ocr import PDFHandwritingOCR, _worker_ready
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 请求体上限（只传路径和参数，不传PDF内容）
+_MAX_BODY = 64 * 1024
+# 统计最近多少个请求的耗时分位数
+_LATENCY_WINDOW = 200
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error',
+            503: 'Service Unavailable'}
+
+
+class OCRServer:
+    """
+    常驻OCR服务：请求进入有上限的队列，由调度任务逐份处理；
+    每份PDF的各页分给常驻的工作进程并行识别
+    """
+    def __init__(self, workers=2, max_queue=8, dpi=300, **options):
+        self.workers = workers
+        self.dpi = dpi
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        # 只有一个工作进程时在服务进程内识别，启动时预热模型
+        self.processor = PDFHandwritingOCR(warm_up=(workers <= 1), **options)
+        self.ready = False
+        self.started = time.time()
+        self.in_progress = 0
+        self.counts = {'completed': 0, 'failed': 0, 'rejected': 0, 'pages': 0}
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+
+    async def start_workers(self):
+        """
+        启动工作进程并等待每个进程加载好模型
+        """
+        if self.workers > 1:
+            # 工作进程在初始化时预热模型
+            self.processor.warm_up_on_start = True
+            pool = self.processor.open_worker_pool(self.workers)
+            loop = asyncio.get_running_loop()
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(pool, _worker_ready) for _ in range(self.workers)])
+            print(f"工作进程已就绪: {sorted(set(pids))}")
+        self.ready = True
+
+    def close(self):
+        self.processor.close_worker_pool()
+
+    async def dispatch(self):
+        """
+        按到达顺序逐份处理队列中的请求
+        """
+        while True:
+            job, future = await self.queue.get()
+            self.in_progress += 1
+            start = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(
+                    self.processor.process_pdf, job['pdf_path'], job.get('output_file'),
+                    job.get('dpi', self.dpi), workers=self.workers,
+                    output_format=job.get('output_format'), compact=job.get('compact', False))
+            except Exception as e:
+                self.counts['failed'] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.counts['completed'] += 1
+                self.counts['pages'] += len(results)
+                if not future.done():
+                    future.set_result(results)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.busy_seconds += elapsed
+                self.latencies.append(elapsed)
+                self.in_progress -= 1
+                self.queue.task_done()
+
+    def health(self):
+        return {
+            'status': 'ok' if self.ready else 'starting',
+            'workers': self.workers,
+            'queued': self.queue.qsize(),
+            'in_progress': self.in_progress,
+        }
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'workers': self.workers,
+            'queue_limit': self.queue.maxsize,
+            'queued': self.queue.qsize(),
+            'in_progress': self.in_progress,
+            **self.counts,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'latency_p50_seconds': percentile(0.5),
+            'latency_p95_seconds': percentile(0.95),
+        }
+
+    async def handle(self, reader, writer):
+        """
+        处理一个HTTP请求（每个连接一个请求）
+        """
+        try:
+            status, payload = await self._route(reader)
+        except Exception as e:
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n")
+        if status == 503:
+            head += "Retry-After: 5\r\n"
+        writer.write((head + "Connection: close\r\n\r\n").encode('ascii') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _route(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            return 400, {'error': '无效的请求'}
+        method, path = request_line[0], request_line[1]
+        length = 0
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+
+        if path == '/health':
+            return 200, self.health()
+        if path == '/metrics':
+            return 200, self.metrics()
+        if path != '/process':
+            return 404, {'error': f'未知路径: {path}'}
+        if method != 'POST':
+            return 405, {'error': '/process 只接受 POST'}
+        if length > _MAX_BODY:
+            return 413, {'error': '请求体过大'}
+
+        try:
+            job = json.loads(await reader.readexactly(length))
+            pdf_path = job['pdf_path']
+        except (ValueError, KeyError, TypeError, asyncio.IncompleteReadError):
+            return 400, {'error': '请求体须为包含 pdf_path 的JSON'}
+        if not os.path.isfile(pdf_path):
+            return 400, {'error': f'文件不存在: {pdf_path}'}
+
+        # 背压：队列已满时立即拒绝，由客户端稍后重试
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            self.counts['rejected'] += 1
+            return 503, {'error': '队列已满，请稍后重试'}
+        try:
+            return 200, {'results': await future}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, max_queue=8, dpi=300,
+                **options):
+    """
+    启动常驻服务，直到进程被中断
+    """
+    server = OCRServer(workers, max_queue, dpi, **options)
+    try:
+        await server.start_workers()
+        dispatcher = asyncio.create_task(server.dispatch())
+        listener = await asyncio.start_server(server.handle, host, port)
+        print(f"OCR服务已启动: http://{host}:{port} (工作进程 {workers}, 队列上限 {max_queue})")
+        async with listener:
+            await listener.serve_forever()
+        dispatcher.cancel()
+    finally:
+        server.close()
+
+
+class OCRClient:
+    """
+    OCR服务的客户端，process_pdf 的返回值与 PDFHandwritingOCR.process_pdf 相同
+    （经过JSON传输，bbox等元组变为列表）
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None
+        if payload is not None:
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            self.base_url + path, data=data,
+            headers={'Content-Type': 'application/json; charset=utf-8'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"OCR服务返回错误 {e.code}: {message}") from None
+
+    def process_pdf(self, pdf_path, output_file=None, dpi=300, output_format=None,
+                    compact=False):
+        """
+        由服务识别PDF（路径须为服务所在机器上的路径），返回各页结果
+        """
+        job = {'pdf_path': os.path.abspath(pdf_path), 'dpi': dpi,
+               'output_format': output_format, 'compact': compact}
+        if output_file:
+            job['output_file'] = os.path.abspath(output_file)
+        return self._request('/process', job)['results']
+
+    def health(self):
+        return self._request('/health')
+
+    def metrics(self):
+        return self._request('/metrics')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pdf_ocr 常驻服务")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help="启动服务")
+    p.add_argument('--host', default=DEFAULT_HOST)
+    p.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p.add_argument('--workers', type=int, default=2, help="工作进程数")
+    p.add_argument('--max-queue', type=int, default=8, help="排队请求数上限，超出时返回503")
+    p.add_argument('--dpi', type=int, default=300, help="请求未指定时使用的DPI")
+    p.add_argument('--cache', help="OCR结果缓存文件")
+
+    # 客户端命令共用的服务地址参数
+    address = argparse.ArgumentParser(add_help=False)
+    address.add_argument('--host', default=DEFAULT_HOST)
+    address.add_argument('--port', type=int, default=DEFAULT_PORT)
+
+    p = sub.add_parser('process', parents=[address], help="通过服务识别PDF")
+    p.add_argument('pdf')
+    p.add_argument('-o', '--output', help="结果JSON文件")
+    p.add_argument('--dpi', type=int, default=300)
+
+    sub.add_parser('health', parents=[address], help="查看服务状态")
+    sub.add_parser('metrics', parents=[address], help="查看服务统计")
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.workers, args.max_queue, args.dpi,
+                              cache_path=args.cache))
+        except KeyboardInterrupt:
+            print("\nOCR服务已停止")
+        return 0
+
+    client = OCRClient(args.host, args.port)
+    try:
+        if args.command == 'process':
+            results = client.process_pdf(args.pdf, args.output, args.dpi)
+            print(f"共处理 {len(results)} 页")
+            if args.output:
+                print(f"结果已保存到: {args.output}")
+        else:
+            print(json.dumps(getattr(client, args.command)(), ensure_ascii=False, indent=2))
+    except (RuntimeError, urllib.error.URLError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
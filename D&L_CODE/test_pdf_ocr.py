@@ -0,0 +1,99 @@
+"""
+pdf_ocr 的回归测试（用固定结果的OCR引擎代替PaddleOCR，不需要加载模型）
+
+用法:
+    python -m pytest -q test_pdf_ocr.py
+"""
+import contextlib
+import io
+import os
+
+import fitz
+import pytest
+
+from pdf_ocr import PDFHandwritingOCR, _render_page
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_PDF = os.path.join(HERE, '..', 'test_data.pdf')
+BUNDLED_PDFS = [TEST_PDF, os.path.join(HERE, 'test_document.pdf')]
+
+
+def _box(cx, cy, w=80, h=20):
+    return [[cx - w / 2, cy - h / 2], [cx + w / 2, cy - h / 2],
+            [cx + w / 2, cy + h / 2], [cx - w / 2, cy + h / 2]]
+
+
+class FixedOCR:
+    """
+    整页识别总是返回同样的两行：注番在JS项番上方 gap 像素处
+    """
+    def __init__(self, gap):
+        self.lines = [
+            [_box(400, 400), ('HA05543', 0.95)],
+            [_box(400, 400 + gap), ('JS0001', 0.95)],
+        ]
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        if not det:
+            images = img if isinstance(img, list) else [img]
+            return [[('3月', 0.9) for _ in images]]
+        return [list(self.lines)]
+
+
+def _note_pairs(dpi, **options):
+    processor = PDFHandwritingOCR(ocr_engine=FixedOCR(gap=120), ocr_batch_size=1, **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = list(processor.iter_results(TEST_PDF, dpi, pages=[0]))
+    return len(results[0]['items']['note_numbers'])
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'pipeline_threads': 1},
+    {'roi_detect_dpi': 72},
+])
+def test_note_threshold_follows_dpi(options):
+    # 120像素在300DPI下约29点（阈值36点以内），在150DPI下约58点（超出阈值）
+    assert _note_pairs(300, **options) == 1
+    assert _note_pairs(150, **options) == 0
+
+
+def _covered(mark, others):
+    # 标记中心落在另一组中同类型标记的外接框内
+    x, y, w, h = mark['bbox']
+    cx, cy = x + w / 2, y + h / 2
+    return any(other['type'] == mark['type']
+               and other['bbox'][0] <= cx <= other['bbox'][0] + other['bbox'][2]
+               and other['bbox'][1] <= cy <= other['bbox'][1] + other['bbox'][3]
+               for other in others)
+
+
+@pytest.mark.parametrize('pdf_path', BUNDLED_PDFS)
+@pytest.mark.parametrize('detect_dpi', [72, 100])
+def test_roi_red_marks_match_full_page(pdf_path, detect_dpi):
+    # ROI模式找到的标记（位置和圆圈/×）与整页全分辨率检测一致
+    # （裁剪渲染与整页渲染的图像重采样略有差异，外接框不要求逐像素相同）
+    processor = PDFHandwritingOCR(ocr_engine=FixedOCR(gap=0), roi_detect_dpi=detect_dpi)
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            full = processor.detect_red_marks(_render_page(page, 300), prescale=0)
+            roi = processor.detect_red_marks_roi(page, 300)
+            assert all(_covered(mark, roi) for mark in full)
+            assert all(_covered(mark, full) for mark in roi)
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize('pdf_path', BUNDLED_PDFS)
+def test_coarse_red_marks_match_full_page(pdf_path):
+    processor = PDFHandwritingOCR(ocr_engine=FixedOCR(gap=0))
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            image = _render_page(page, 300)
+            key = lambda regions: sorted((r['bbox'], r['type']) for r in regions)
+            assert key(processor.detect_red_marks(image, prescale=0.25)) == \
+                key(processor.detect_red_marks(image, prescale=0))
+    finally:
+        doc.close()
@@ -1,16 +1,12 @@
-import datetime
+import importlib.util
+import os
+
+# 日期规范化统一使用 up-git/date_normalizer.py
+# 按文件路径以独立的模块名加载，不修改 sys.path（避免同级目录的模块遮蔽标准库等同名模块）
+_NORMALIZER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'up-git', 'date_normalizer.py')
+_spec = importlib.util.spec_from_file_location('up_git_date_normalizer', _NORMALIZER_PATH)
+date_normalizer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(date_normalizer)
 
 def extract_year_month(val):
-    if isinstance(val, datetime):
-        return val.strftime("%Y-%m")
-    if isinstance(val, str) and val:
-        val = val.strip()
-        try:
-            for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m"]:
-                try:
-                    return datetime.strptime(val, fmt).strftime("%Y-%m")
-                except:
-                    pass
-        except:
-            pass
-    return None
+    return date_normalizer.year_month(val)
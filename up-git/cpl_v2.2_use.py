@@ -4,70 +4,642 @@ Excel日期比对工具
 比较Excel文件中N列和AC列的日期，将年月不同的行复制到新的sheet
 如果AC列日期比N列日期更靠后，则将该行标记为红色背景
 在第31列前插入「確認結果」列，保留原样式，设置数据验证
+
+用法:
+    python cpl_v2.2_use.py            结果写回原文件的「Different_dates」sheet
+    python cpl_v2.2_use.py --report   结果写到单独的报告文件（原文件名_Different_dates.xlsx），不改写原文件
+    python cpl_v2.2_use.py batch 目录或通配符... [--sheet 规则] [--n-col N] [--ac-col AC] [--workers 4]
+                                      无界面批量处理，结果写到报告文件，并输出汇总CSV/JSON
 """
 
-import tkinter as tk
-from tkinter import filedialog, messagebox
 import openpyxl
+from openpyxl.utils import column_index_from_string
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
 from openpyxl.worksheet.datavalidation import DataValidation
-from datetime import datetime
+from openpyxl.worksheet.dimensions import ColumnDimension
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from copy import copy
+from fnmatch import fnmatchcase
+from glob import glob
+from xml.etree.ElementTree import iterparse, parse as parse_xml
+import argparse
+import csv
+import json
 import sys
 import os
+import posixpath
+import time
+import zipfile
+
+from date_normalizer import normalize_date
 
 # 设置默认编码
 if sys.version_info[0] < 3:
     reload(sys)
     sys.setdefaultencoding('utf-8')
 
-print("GAME START")
+N_COL = 14  # Column N
+AC_COL = 29  # Column AC
+# 第1行空行，第2行表头，数据从第3行开始
+HEADER_ROWS = 2
+
+# 标红用的填充只创建一次
+RED_FILL = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+
+# 结果sheet中插入的「確認結果」列（AE）
+CHECK_COL = 31
+CHECK_HEADER = "確認結果"
+CHECK_WIDTH = 12
+CHECK_CHOICES = '"計画納期が正,出荷予定日が正,工程調査"'
+
+RESULT_SHEET = 'Different_dates'
+REPORT_SUFFIX = '_Different_dates.xlsx'
+
+class StyleCache:
+    # 样式驻留：每种源样式只在目标工作簿中登记一次，
+    # 之后同样式的单元格直接复用登记好的样式编号，不再逐个复制字体/边框/填充对象
+    def __init__(self):
+        self.copied = {}  # 源样式 -> 目标样式编号
+        self.red = {}  # 目标样式编号 -> 加上红色背景后的样式编号
+
+def _style_key(cell):
+    # 源样式的标识：所属工作簿 + 样式编号（只读单元格只有样式表中的序号）
+    workbook = cell.parent.parent
+    if hasattr(cell, '_style_id'):
+        return id(workbook), cell._style_id
+    return id(workbook), tuple(cell._style)
+
+def copy_cell(source, target, styles=None):
+    target.value = source.value
+    # 只读模式下的空单元格（EmptyCell）没有样式属性
+    if not getattr(source, 'has_style', False):
+        return
+    if styles is not None:
+        key = _style_key(source)
+        style = styles.copied.get(key)
+        if style is not None:
+            target._style = copy(style)
+            return
+    target.font = copy(source.font)
+    target.border = copy(source.border)
+    target.fill = copy(source.fill)
+    target.number_format = source.number_format
+    target.alignment = copy(source.alignment)
+    if styles is not None:
+        styles.copied[key] = copy(target._style)
+
+def mark_red(cell, styles=None):
+    if styles is None:
+        cell.fill = RED_FILL
+        return
+    # 没有样式的单元格 _style 为 None
+    key = tuple(cell._style or ())
+    style = styles.red.get(key)
+    if style is None:
+        cell.fill = RED_FILL
+        styles.red[key] = style = copy(cell._style)
+    else:
+        cell._style = copy(style)
+
+def apply_red_background(ws, row_num, max_col, styles=None):
+    for col in range(1, max_col + 1):
+        mark_red(ws.cell(row_num, col), styles)
+
+def find_mismatched_rows(file_path, sheet_name, n_col=N_COL, ac_col=AC_COL):
+    # 第一遍：只读模式流式读取sheet的值，找出N列和AC列年月不同的行
+    # 返回 ([(行号, 是否标红), ...], 最大列号)，不加载样式，也不保留整张表
+    # 最大列号按实际存在的单元格计算，不采用文件中记录的尺寸
+    # （有的软件会记录 A1:XFD… 这样过大的范围）；合并区域由 read_sheet_layout 补充
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=False)
+    try:
+        ws = wb[sheet_name]
+        # 清除记录的尺寸后，每行只返回到该行最后一个单元格为止
+        ws.reset_dimensions()
+        matches = []
+        max_col = 0
+        for orig_row, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
+            max_col = max(max_col, len(row))
+            if orig_row <= HEADER_ROWS:
+                continue
+            n_val = row[n_col - 1] if len(row) >= n_col else None
+            ac_val = row[ac_col - 1] if len(row) >= ac_col else None
+
+            # 每个值只解析一次（相同字符串有缓存）
+            n_date = normalize_date(n_val)
+            ac_date = normalize_date(ac_val)
+
+            if n_date and ac_date and (n_date.year, n_date.month) != (ac_date.year, ac_date.month):
+                # AC列日期比N列日期更靠后时标记为红色
+                matches.append((orig_row, ac_date > n_date))
+        return matches, max_col
+    finally:
+        wb.close()
 
-def extract_year_month(val):
-    if isinstance(val, datetime):
-        return val.strftime("%Y-%m")
-    if isinstance(val, str) and val:
-        val = val.strip()
-        try:
-            for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m"]:
-                try:
-                    return datetime.strptime(val, fmt).strftime("%Y-%m")
-                except:
-                    pass
-        except:
-            pass
-    return None
-
-def parse_date_for_comparison(val):
-    if isinstance(val, datetime):
-        return val
-    if isinstance(val, str) and val:
-        val = val.strip()
+def read_rows(file_path, sheet_name, row_numbers, max_col):
+    # 第二遍：只取出表头和指定行的单元格（含样式），内存只与匹配行数有关
+    wanted = set(range(1, HEADER_ROWS + 1)) | set(row_numbers)
+    last_row = max(wanted)
+    rows = {}
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=False)
+    try:
+        ws = wb[sheet_name]
+        for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=last_row, max_col=max_col), 1):
+            if row_idx in wanted:
+                rows[row_idx] = row
+    finally:
+        wb.close()
+    return rows
+
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+def _rel_targets(archive, part):
+    # 部件的关系 {Id: (类型, 目标部件路径)}
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, '_rels', name + '.rels')
+    targets = {}
+    with archive.open(rels_path) as f:
+        for rel in parse_xml(f).getroot().iter(_PKG_REL_NS + 'Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            targets[rel.get('Id')] = (rel.get('Type'), target)
+    return targets
+
+def sheet_part(archive, sheet_name):
+    # 按 workbook.xml 和其关系文件找出sheet对应的XML部件路径
+    workbook = next(target for rel_type, target in _rel_targets(archive, '').values()
+                    if rel_type == _OFFICE_DOCUMENT)
+    sheet_rels = _rel_targets(archive, workbook)
+    with archive.open(workbook) as f:
+        for sheet in parse_xml(f).getroot().iter():
+            if sheet.tag.rsplit('}', 1)[-1] == 'sheet' and sheet.get('name') == sheet_name:
+                return sheet_rels[sheet.get(_REL_NS + 'id')][1]
+    raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+def read_sheet_layout(file_path, sheet_name):
+    # 只读模式的sheet没有 merged_cells / column_dimensions，直接从xlsx中sheet的XML取
+    # 返回 列宽 [(起始列, 结束列, 宽度), ...] 和 合并区域 [CellRange, ...]
+    widths = []
+    merges = []
+    with zipfile.ZipFile(file_path) as archive, archive.open(sheet_part(archive, sheet_name)) as f:
+        for _, elem in iterparse(f):
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag == 'row':
+                # 单元格数据不需要，读完一行就释放
+                elem.clear()
+            elif tag == 'col' and elem.get('width'):
+                widths.append((int(elem.get('min')), int(elem.get('max')), float(elem.get('width'))))
+            elif tag == 'mergeCell':
+                merges.append(CellRange(elem.get('ref')))
+    return widths, merges
+
+def report_columns(min_col, max_col):
+    # 原sheet的列范围换算到结果sheet：CHECK_COL及之后右移一列，跨越CHECK_COL的范围在该列处分开
+    if min_col >= CHECK_COL:
+        return [(min_col + 1, max_col + 1)]
+    if max_col < CHECK_COL:
+        return [(min_col, max_col)]
+    ranges = [(min_col, CHECK_COL - 1)]
+    if max_col > CHECK_COL:
+        ranges.append((CHECK_COL + 1, max_col + 1))
+    return ranges
+
+def report_row(ws, source_row, styles, red=False, value=None):
+    # 结果sheet的一行：复制原行的值和样式，在CHECK_COL处插入「確認結果」列（沿用前一列的样式）
+    cells = []
+    for source in source_row:
+        cell = WriteOnlyCell(ws)
+        copy_cell(source, cell, styles)
+        if red:
+            mark_red(cell, styles)
+        cells.append(cell)
+    while len(cells) < CHECK_COL - 1:
+        cells.append(None)
+    check = WriteOnlyCell(ws, value)
+    if cells[CHECK_COL - 2] is not None:
+        check._style = copy(cells[CHECK_COL - 2]._style)
+    cells.insert(CHECK_COL - 1, check)
+    return cells
+
+def write_report(report_path, source_rows, matches, layout):
+    # 按最终的列布局一次写出结果sheet（只写模式），不插入列、不改写原文件
+    # 返回标红的行数
+    widths, merges = layout
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(RESULT_SHEET)
+    styles = StyleCache()
+
+    # 列宽、合并区域、数据验证都须在写入行之前设置好
+    for min_col, max_col, width in widths:
+        for start, end in report_columns(min_col, max_col):
+            ws.column_dimensions[get_column_letter(start)] = ColumnDimension(
+                ws, min=start, max=end, width=width, customWidth=True)
+    check_letter = get_column_letter(CHECK_COL)
+    ws.column_dimensions[check_letter] = ColumnDimension(
+        ws, min=CHECK_COL, max=CHECK_COL, width=CHECK_WIDTH, customWidth=True)
+
+    # 合并单元格（仅表头部分）
+    for merged in merges:
+        if merged.min_row <= HEADER_ROWS:
+            for start, end in report_columns(merged.min_col, merged.max_col):
+                ws.merged_cells.add(CellRange(min_col=start, min_row=merged.min_row,
+                                              max_col=end, max_row=merged.max_row))
+
+    last_row = HEADER_ROWS + len(matches)
+    if matches:
+        dv = DataValidation(type="list", formula1=CHECK_CHOICES, allow_blank=True)
+        dv.showDropDown = True
+        dv.showInputMessage = False
+        dv.showErrorMessage = False
+        dv.add(f"{check_letter}{HEADER_ROWS + 1}:{check_letter}{last_row}")
+        ws.data_validations.append(dv)
+
+    # 表头：第1行空行，第2行的「確認結果」列写入列名
+    for row in range(1, HEADER_ROWS + 1):
+        value = CHECK_HEADER if row == HEADER_ROWS else None
+        ws.append(report_row(ws, source_rows[row], styles, value=value))
+
+    red_count = 0
+    for orig_row, red in matches:
+        ws.append(report_row(ws, source_rows.pop(orig_row), styles, red))
+        red_count += red
+
+    wb.save(report_path)
+    return red_count
+
+def write_in_place(file_path, sheet_name, source_rows, matches, original_max_col):
+    # 结果写回原文件的 Different_dates sheet，返回标红的行数
+    # 合并单元格和列宽从原sheet取得
+    wb = openpyxl.load_workbook(file_path, data_only=False)
+    ws = wb[sheet_name]
+
+    # 删除已存在的 Different_dates sheet
+    if 'Different_dates' in wb.sheetnames:
+        del wb['Different_dates']
+    new_ws = wb.create_sheet('Different_dates')
+
+    # 相同样式只登记一次
+    styles = StyleCache()
+
+    # 首先完全复制原始表格结构（前两行：第1行空行，第2行表头）
+    for row in range(1, HEADER_ROWS + 1):
+        for col, cell in enumerate(source_rows[row], 1):
+            copy_cell(cell, new_ws.cell(row, col), styles)
+
+    # 复制符合条件的数据行
+    new_row = HEADER_ROWS + 1  # 从第3行开始（保持表头结构）
+    red_count = 0
+
+    for orig_row, red in matches:
+        # 复制整行数据
+        for col, cell in enumerate(source_rows.pop(orig_row), 1):
+            copy_cell(cell, new_ws.cell(new_row, col), styles)
+
+        # AC列日期比N列日期更靠后时标记为红色
+        if red:
+            apply_red_background(new_ws, new_row, original_max_col, styles)
+            red_count += 1
+
+        new_row += 1
+
+    # 现在在所有数据复制完成后插入第31列
+    new_ws.insert_cols(31)
+
+    # 设置第31列的表头
+    # 第1行第31列保持空
+    copy_cell(new_ws.cell(1, 30), new_ws.cell(1, 31), styles)
+    new_ws.cell(1, 31).value = None
+        
+    # 第2行第31列设置为"確認結果"
+    copy_cell(new_ws.cell(2, 30), new_ws.cell(2, 31), styles)
+    new_ws.cell(2, 31).value = "確認結果"
+
+    # 为所有数据行的第31列设置样式和空值
+    for row_idx in range(3, new_row):
+        copy_cell(new_ws.cell(row_idx, 30), new_ws.cell(row_idx, 31), styles)
+        new_ws.cell(row_idx, 31).value = None
+
+    # 复制列宽
+    for col_letter in ws.column_dimensions:
+        col_num = openpyxl.utils.column_index_from_string(col_letter)
+        if col_num <= 30:
+            new_ws.column_dimensions[col_letter].width = ws.column_dimensions[col_letter].width
+        elif col_num >= 31:
+            # 原来的31列及之后现在变成32列及之后
+            new_col_letter = openpyxl.utils.get_column_letter(col_num + 1)
+            new_ws.column_dimensions[new_col_letter].width = ws.column_dimensions[col_letter].width
+        
+    # 设置新的確認結果列（31列）的宽度
+    new_ws.column_dimensions['AE'].width = 12
+
+    # 复制合并单元格（仅表头部分）
+    for merged_range in ws.merged_cells.ranges:
+        if merged_range.min_row <= 2:
+            # 如果合并区域包含31列及之后，需要调整
+            if merged_range.min_col >= 31:
+                # 整个合并区域在31列之后，所有列号+1
+                new_ws.merge_cells(
+                    start_row=merged_range.min_row, start_column=merged_range.min_col + 1,
+                    end_row=merged_range.max_row, end_column=merged_range.max_col + 1
+                )
+            elif merged_range.max_col >= 31:
+                # 合并区域跨越31列，需要分割处理
+                if merged_range.min_col < 31:
+                    # 31列之前的部分
+                    new_ws.merge_cells(
+                        start_row=merged_range.min_row, start_column=merged_range.min_col,
+                        end_row=merged_range.max_row, end_column=30
+                    )
+                    # 32列之后的部分
+                    if merged_range.max_col > 31:
+                        new_ws.merge_cells(
+                            start_row=merged_range.min_row, start_column=32,
+                            end_row=merged_range.max_row, end_column=merged_range.max_col + 1
+                        )
+            else:
+                # 合并区域在31列之前，直接复制
+                new_ws.merge_cells(str(merged_range))
+
+    # 创建数据验证对象（尝试更直接的设置方式）
+    from openpyxl.worksheet.datavalidation import DataValidation
+        
+    # 使用更明确的参数设置
+    dv = DataValidation(
+        type="list",
+        formula1='"計画納期が正,出荷予定日が正,工程調査"',
+        allow_blank=True
+    )
+        
+    # 手动设置showDropDown属性
+    dv.showDropDown = True
+    dv.showInputMessage = False
+    dv.showErrorMessage = False
+        
+    # 创建单元格范围字符串
+    if new_row > 3:
+        range_str = f"AE3:AE{new_row-1}"
+        dv.add(range_str)
+        new_ws.add_data_validation(dv)
+            
+        # 额外尝试：为每个单元格单独设置
+        for row_idx in range(3, new_row):
+            cell = new_ws.cell(row_idx, 31)
+            # 尝试直接设置单元格的数据验证属性
+            try:
+                cell.data_type = 's'  # 设置为字符串类型
+            except:
+                pass
+
+    wb.save(file_path)
+    wb.close()
+    return red_count
+
+def compare_sheet(file_path, sheet_name, n_col=N_COL, ac_col=AC_COL, report_path=None):
+    # 比对一个sheet并写出结果：report_path 为 None 时写回原文件，否则写到该报告文件
+    # 返回 (年月不同的行数, 标红的行数)；没有年月不同的行时不写任何文件，
+    # 报告模式下还会删除上次运行留下的报告，避免被当成本次的结果
+    # 第一遍只读N列和AC列，没有年月不同的行时不需要加载整个文件
+    matches, original_max_col = find_mismatched_rows(file_path, sheet_name, n_col, ac_col)
+    if not matches:
+        if report_path and os.path.exists(report_path):
+            os.remove(report_path)
+        return 0, 0
+
+    # 列宽和合并区域；最大列号还要包含合并区域（与完整加载时的 max_column 相同）
+    layout = read_sheet_layout(file_path, sheet_name)
+    original_max_col = max([original_max_col] + [merged.max_col for merged in layout[1]])
+
+    # 第二遍只取表头和匹配行
+    source_rows = read_rows(file_path, sheet_name, [row for row, _ in matches], original_max_col)
+
+    if report_path:
+        # 报告模式：按最终列布局一次写出，原文件不变
+        red_count = write_report(report_path, source_rows, matches, layout)
+    else:
+        red_count = write_in_place(file_path, sheet_name, source_rows, matches, original_max_col)
+    return len(matches), red_count
+
+def report_path_for(file_path):
+    return os.path.splitext(file_path)[0] + REPORT_SUFFIX
+
+def result_message(count, red_count, saved_to):
+    message = f"{count} 件の年月が異なるデータが見つかりました。\n"
+    message += f"そのうち, {red_count} 件は、出荷予定日が計画納期より遅く、赤色でマークされました。\n"
+    message += f"列{CHECK_COL}（{get_column_letter(CHECK_COL)}）に「{CHECK_HEADER}」列を追加し、選択肢付きの入力制限を設定しました。\n"
+    message += f"結果は{saved_to}に保存されました。"
+    return message
+
+BATCH_SUMMARY = 'date_batch_summary.csv'
+BATCH_EXTENSIONS = ('.xlsx', '.xlsm')
+SUMMARY_FIELDS = ['file', 'sheet', 'status', 'rows', 'red', 'seconds', 'report', 'error']
+
+def summary_entry(rel, sheet_name, **fields):
+    # 汇总记录：成功和失败的记录都带全部字段，没有值的为 None
+    entry = dict.fromkeys(SUMMARY_FIELDS)
+    entry.update(file=rel, sheet=sheet_name, **fields)
+    return entry
+
+def failed_entry(rel, error, seconds=0.0):
+    # 整个文件失败（打不开、输出重复、工作进程异常退出）时的汇总记录
+    return summary_entry(rel, None, status='failed', seconds=seconds, error=error)
+
+def glob_root(pattern):
+    # 通配符之前的目录部分（g/*/x*.xlsx -> g），无通配符时为文件所在目录
+    for index, char in enumerate(pattern):
+        if char in '*?[':
+            return os.path.dirname(pattern[:index])
+    return os.path.dirname(pattern)
+
+def find_workbooks(inputs):
+    # 目录（递归查找 .xlsx/.xlsm）或通配符，返回 [(路径, 相对路径), ...]
+    # 相对路径相对于输入目录或通配符之前的目录，用于在输出目录下保持子目录结构
+    # 跳过Excel的临时文件（~$开头）和本工具生成的报告文件
+    found = {}
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for dirpath, dirnames, filenames in os.walk(pattern):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(BATCH_EXTENSIONS):
+                        path = os.path.join(dirpath, filename)
+                        found.setdefault(os.path.abspath(path), os.path.relpath(path, pattern))
+        else:
+            for path in sorted(glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path),
+                                     os.path.relpath(path, glob_root(pattern) or '.'))
+    return [(path, rel) for path, rel in found.items()
+            if not os.path.basename(path).startswith('~$') and not path.endswith(REPORT_SUFFIX)]
+
+def select_sheets(sheet_names, rule=None):
+    # rule 为 None 时取第一张sheet，否则取名称符合通配符规则的所有sheet（区分大小写）
+    # 结果sheet本身不作为处理对象
+    candidates = [name for name in sheet_names if name != RESULT_SHEET]
+    if rule is None:
+        return candidates[:1]
+    return [name for name in candidates if fnmatchcase(name, rule)]
+
+def batch_report_path(rel, sheet_name, out_dir):
+    # 报告文件：在输出目录下保持输入的子目录结构，文件名包含sheet名
+    return os.path.join(out_dir, f"{os.path.splitext(rel)[0]}_{sheet_name}{REPORT_SUFFIX}")
+
+def process_workbook(file_path, rel, out_dir, sheet_rule=None, n_col=N_COL, ac_col=AC_COL):
+    # 批量模式下处理一个文件（在工作进程中执行），每个sheet返回一条汇总记录
+    # 出错时记录错误，不向外抛出
+    entries = []
+    start = time.perf_counter()
+    try:
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        sheet_names = wb.sheetnames
+        wb.close()
+        sheets = select_sheets(sheet_names, sheet_rule)
+        if not sheets:
+            raise ValueError(f"対象のシートがありません: {', '.join(sheet_names)}")
+    except Exception as e:
+        return [failed_entry(rel, f"{type(e).__name__}: {e}",
+                             round(time.perf_counter() - start, 3))]
+
+    for sheet_name in sheets:
+        entry = summary_entry(rel, sheet_name)
+        if out_dir:
+            report_path = batch_report_path(rel, sheet_name, out_dir)
+        else:
+            report_path = batch_report_path(os.path.basename(file_path), sheet_name,
+                                            os.path.dirname(file_path))
+        start = time.perf_counter()
         try:
-            for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m"]:
+            os.makedirs(os.path.dirname(report_path), exist_ok=True)
+            count, red_count = compare_sheet(file_path, sheet_name, n_col, ac_col, report_path)
+            entry.update(status='ok', rows=count, red=red_count,
+                         report=report_path if count else None)
+        except Exception as e:
+            entry.update(status='failed', error=f"{type(e).__name__}: {e}")
+            # 不完整的报告文件删除
+            if os.path.exists(report_path):
+                os.remove(report_path)
+        entry['seconds'] = round(time.perf_counter() - start, 3)
+        entries.append(entry)
+    return entries
+
+def write_summary(path, entries):
+    # 汇总文件：扩展名为 .json 时写JSON，否则写CSV（带BOM，Excel直接打开不乱码）
+    # 先写临时文件再替换，中途中断时不会留下半个文件
+    tmp_path = path + '.tmp'
+    if path.lower().endswith('.json'):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(entries)
+    os.replace(tmp_path, path)
+
+def process_batch(inputs, out_dir=None, summary_path=None, sheet_rule=None,
+                  n_col=N_COL, ac_col=AC_COL, workers=None):
+    # 无界面批量处理：多个文件在进程池中并行比对，结果写到报告文件（不改写原文件）
+    # out_dir 为 None 时报告写在各原文件旁边；每处理完一个文件就更新汇总
+    workbooks = find_workbooks(inputs)
+    print(f"{len(workbooks)} 個のファイルが見つかりました")
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    summary_path = summary_path or os.path.join(out_dir or '.', BATCH_SUMMARY)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    entries = []
+    done = 0
+
+    def record(rel, results):
+        nonlocal done
+        done += 1
+        for entry in results:
+            status = entry['status']
+            if status == 'ok':
+                detail = f"{entry['rows']} 件, 赤 {entry['red']} 件, {entry['seconds']}s"
+            else:
+                detail = f"❌ {entry['error']}"
+            print(f"[{done}/{len(workbooks)}] {rel} [{entry['sheet']}] {detail}")
+        entries.extend(results)
+        write_summary(summary_path, entries)
+
+    # 输出目录下相对路径相同的文件会写到同一个报告，只处理第一个，其余记为失败
+    jobs = []
+    claimed = {}
+    for path, rel in workbooks:
+        key = os.path.normcase(os.path.normpath(rel))
+        if out_dir and key in claimed:
+            record(rel, [failed_entry(rel, f"出力先が {claimed[key]} と重複しています: {path}")])
+        else:
+            claimed[key] = path
+            jobs.append((path, rel))
+
+    if workers <= 1:
+        for path, rel in jobs:
+            record(rel, process_workbook(path, rel, out_dir, sheet_rule, n_col, ac_col))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, max(len(jobs), 1))) as pool:
+            futures = {pool.submit(process_workbook, path, rel, out_dir, sheet_rule, n_col, ac_col): rel
+                       for path, rel in jobs}
+            for future in as_completed(futures):
+                rel = futures[future]
                 try:
-                    return datetime.strptime(val, fmt)
-                except:
-                    pass
-        except:
-            pass
-    return None
-
-def copy_cell(source, target):
-    target.value = source.value
-    if source.has_style:
-        target.font = copy(source.font)
-        target.border = copy(source.border)
-        target.fill = copy(source.fill)
-        target.number_format = source.number_format
-        target.alignment = copy(source.alignment)
-
-def apply_red_background(ws, row_num, max_col):
-    red_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
-    for col in range(1, max_col + 1):
-        ws.cell(row_num, col).fill = red_fill
+                    results = future.result()
+                except Exception as e:
+                    # 工作进程异常退出（内存不足等）时也只记录该文件
+                    results = [failed_entry(rel, f"{type(e).__name__}: {e}")]
+                record(rel, results)
+
+    # 汇总按文件名排列，与完成顺序无关
+    entries.sort(key=lambda entry: (entry['file'], entry['sheet'] or ''))
+    write_summary(summary_path, entries)
+    failed = sum(entry['status'] != 'ok' for entry in entries)
+    print(f"\n処理完了: {len(entries) - failed} 件成功, {failed} 件失敗 "
+          f"({time.perf_counter() - start:.1f}s)")
+    print(f"集計ファイル: {summary_path}")
+    return entries
+
+def column_index(letter):
+    # 列字母（N / AC）转换为列号
+    try:
+        return column_index_from_string(letter.strip().upper())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"無効な列: {letter}")
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog='cpl_v2.2_use.py batch',
+                                     description="批量比对多个Excel文件的日期（无界面）")
+    parser.add_argument('inputs', nargs='+', help="目录（递归查找 .xlsx/.xlsm）或通配符")
+    parser.add_argument('-o', '--out-dir', help="报告保存目录（默认保存在原文件旁边）")
+    parser.add_argument('--summary', help=f"汇总文件 .csv 或 .json（默认 输出目录/{BATCH_SUMMARY}）")
+    parser.add_argument('--sheet', help="处理的sheet名（可用 * ? 通配符，默认第一张sheet）")
+    parser.add_argument('--n-col', type=column_index, default=N_COL, help="計画納期列（默认 N）")
+    parser.add_argument('--ac-col', type=column_index, default=AC_COL, help="出荷予定日列（默认 AC）")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认CPU核数）")
+    args = parser.parse_args(argv)
+
+    entries = process_batch(args.inputs, args.out_dir, args.summary, args.sheet,
+                            args.n_col, args.ac_col, args.workers)
+    if not entries:
+        return 2
+    return 1 if any(entry['status'] != 'ok' for entry in entries) else 0
+
+def main(argv=None):
+    # 界面模块只在交互模式下导入，批量模式可在无图形界面的机器上运行
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+
+    parser = argparse.ArgumentParser(description="Excel日期比对工具")
+    parser.add_argument('--report', action='store_true',
+                        help="结果写到单独的报告文件，不改写原文件")
+    args = parser.parse_args(argv)
 
-def main():
     print("Main function started")
 
     root = tk.Tk()
@@ -85,8 +657,10 @@ def main():
     print(f"選択されたファイル: {file_path}")
 
     try:
-        wb = openpyxl.load_workbook(file_path, data_only=False)
+        # 先用只读模式取sheet名，不加载整个文件
+        wb = openpyxl.load_workbook(file_path, read_only=True)
         sheet_names = wb.sheetnames
+        wb.close()
 
         if len(sheet_names) == 1:
             sheet_name = sheet_names[0]
@@ -126,151 +700,21 @@ def main():
                 return
 
         print(f"選択されたシート:  {sheet_name}")
-        ws = wb[sheet_name]
-
-        # 删除已存在的 Different_dates sheet
-        if 'Different_dates' in wb.sheetnames:
-            del wb['Different_dates']
-        new_ws = wb.create_sheet('Different_dates')
-
-        N_COL = 14  # Column N
-        AC_COL = 29  # Column AC
-        original_max_col = ws.max_column
-
-        # 首先完全复制原始表格结构（前两行：第1行空行，第2行表头）
-        for row in range(1, 3):
-            for col in range(1, original_max_col + 1):
-                copy_cell(ws.cell(row, col), new_ws.cell(row, col))
-
-        # 收集符合条件的数据行并复制
-        new_row = 3  # 从第3行开始（保持表头结构）
-        count = 0
-        red_count = 0
-
-        for orig_row in range(3, ws.max_row + 1):
-            n_val = ws.cell(orig_row, N_COL).value
-            ac_val = ws.cell(orig_row, AC_COL).value
-            
-            n_date = extract_year_month(n_val)
-            ac_date = extract_year_month(ac_val)
-            
-            if n_date and ac_date and n_date != ac_date:
-                count += 1
-                
-                # 复制整行数据
-                for col in range(1, original_max_col + 1):
-                    copy_cell(ws.cell(orig_row, col), new_ws.cell(new_row, col))
-                
-                # 检查是否需要标记为红色
-                n_datetime = parse_date_for_comparison(n_val)
-                ac_datetime = parse_date_for_comparison(ac_val)
-                if n_datetime and ac_datetime and ac_datetime > n_datetime:
-                    apply_red_background(new_ws, new_row, original_max_col)
-                    red_count += 1
-                
-                new_row += 1
 
+        report_path = report_path_for(file_path) if args.report else None
+        count, red_count = compare_sheet(file_path, sheet_name, report_path=report_path)
         if count == 0:
             messagebox.showinfo("Complete", "年月が異なる行は見つかりませんでした。")
             return
 
-        # 现在在所有数据复制完成后插入第31列
-        new_ws.insert_cols(31)
-
-        # 设置第31列的表头
-        # 第1行第31列保持空
-        copy_cell(new_ws.cell(1, 30), new_ws.cell(1, 31))
-        new_ws.cell(1, 31).value = None
-        
-        # 第2行第31列设置为"確認結果"
-        copy_cell(new_ws.cell(2, 30), new_ws.cell(2, 31))
-        new_ws.cell(2, 31).value = "確認結果"
-
-        # 为所有数据行的第31列设置样式和空值
-        for row_idx in range(3, new_row):
-            copy_cell(new_ws.cell(row_idx, 30), new_ws.cell(row_idx, 31))
-            new_ws.cell(row_idx, 31).value = None
-
-        # 复制列宽
-        for col_letter in ws.column_dimensions:
-            col_num = openpyxl.utils.column_index_from_string(col_letter)
-            if col_num <= 30:
-                new_ws.column_dimensions[col_letter].width = ws.column_dimensions[col_letter].width
-            elif col_num >= 31:
-                # 原来的31列及之后现在变成32列及之后
-                new_col_letter = openpyxl.utils.get_column_letter(col_num + 1)
-                new_ws.column_dimensions[new_col_letter].width = ws.column_dimensions[col_letter].width
-        
-        # 设置新的確認結果列（31列）的宽度
-        new_ws.column_dimensions['AE'].width = 12
-
-        # 复制合并单元格（仅表头部分）
-        for merged_range in ws.merged_cells.ranges:
-            if merged_range.min_row <= 2:
-                # 如果合并区域包含31列及之后，需要调整
-                if merged_range.min_col >= 31:
-                    # 整个合并区域在31列之后，所有列号+1
-                    new_ws.merge_cells(
-                        start_row=merged_range.min_row, start_column=merged_range.min_col + 1,
-                        end_row=merged_range.max_row, end_column=merged_range.max_col + 1
-                    )
-                elif merged_range.max_col >= 31:
-                    # 合并区域跨越31列，需要分割处理
-                    if merged_range.min_col < 31:
-                        # 31列之前的部分
-                        new_ws.merge_cells(
-                            start_row=merged_range.min_row, start_column=merged_range.min_col,
-                            end_row=merged_range.max_row, end_column=30
-                        )
-                        # 32列之后的部分
-                        if merged_range.max_col > 31:
-                            new_ws.merge_cells(
-                                start_row=merged_range.min_row, start_column=32,
-                                end_row=merged_range.max_row, end_column=merged_range.max_col + 1
-                            )
-                else:
-                    # 合并区域在31列之前，直接复制
-                    new_ws.merge_cells(str(merged_range))
-
-        # 创建数据验证对象（尝试更直接的设置方式）
-        from openpyxl.worksheet.datavalidation import DataValidation
-        
-        # 使用更明确的参数设置
-        dv = DataValidation(
-            type="list",
-            formula1='"計画納期が正,出荷予定日が正,工程調査"',
-            allow_blank=True
-        )
-        
-        # 手动设置showDropDown属性
-        dv.showDropDown = True
-        dv.showInputMessage = False
-        dv.showErrorMessage = False
-        
-        # 创建单元格范围字符串
-        if new_row > 3:
-            range_str = f"AE3:AE{new_row-1}"
-            dv.add(range_str)
-            new_ws.add_data_validation(dv)
-            
-            # 额外尝试：为每个单元格单独设置
-            for row_idx in range(3, new_row):
-                cell = new_ws.cell(row_idx, 31)
-                # 尝试直接设置单元格的数据验证属性
-                try:
-                    cell.data_type = 's'  # 设置为字符串类型
-                except:
-                    pass
-
-        wb.save(file_path)
-        wb.close()
+        if report_path:
+            print(f"結果ファイル: {report_path}")
+            messagebox.showinfo("Complete", result_message(
+                count, red_count, f"「{os.path.basename(report_path)}」の「{RESULT_SHEET}」シート"))
+            return
 
-        message = f"{count} 件の年月が異なるデータが見つかりました。\n"
-        message += f"そのうち, {red_count} 件は、出荷予定日が計画納期より遅く、赤色でマークされました。\n"
-        message += "列31（AE）に「確認結果」列を追加し、選択肢付きの入力制限を設定しました。\n"
-        message += "結果は「Different_dates」シートに保存されました。"
 
-        messagebox.showinfo("Complete", message)
+        messagebox.showinfo("Complete", result_message(count, red_count, f"「{RESULT_SHEET}」シート"))
 
     except Exception as e:
         import traceback
@@ -279,6 +723,10 @@ def main():
         messagebox.showerror("Error", error_msg)
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(batch_main(sys.argv[2:]))
+
+    print("GAME START")
     print("Excel Date Comparison Tool")
     try:
         main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+日期规范化的微基准测试：改写前的 extract_year_month + parse_date_for_comparison vs date_normalizer
+
+用法:
+    python date_bench.py [--rows 100000] [--distinct 2000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+import date_normalizer
+from date_normalizer import normalize_date
+
+
+# 改写前的实现，仅用于对比
+def _legacy_extract_year_month(val):
+    if isinstance(val, datetime):
+        return val.strftime("%Y-%m")
+    if isinstance(val, str) and val:
+        val = val.strip()
+        try:
+            for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m"]:
+                try:
+                    return datetime.strptime(val, fmt).strftime("%Y-%m")
+                except:
+                    pass
+        except:
+            pass
+    return None
+
+def _legacy_parse_date_for_comparison(val):
+    if isinstance(val, datetime):
+        return val
+    if isinstance(val, str) and val:
+        val = val.strip()
+        try:
+            for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m"]:
+                try:
+                    return datetime.strptime(val, fmt)
+                except:
+                    pass
+        except:
+            pass
+    return None
+
+
+def legacy_compare(n_val, ac_val):
+    n_date = _legacy_extract_year_month(n_val)
+    ac_date = _legacy_extract_year_month(ac_val)
+    if n_date and ac_date and n_date != ac_date:
+        n_datetime = _legacy_parse_date_for_comparison(n_val)
+        ac_datetime = _legacy_parse_date_for_comparison(ac_val)
+        return bool(n_datetime and ac_datetime and ac_datetime > n_datetime)
+    return None
+
+def normalized_compare(n_val, ac_val):
+    n_date = normalize_date(n_val)
+    ac_date = normalize_date(ac_val)
+    if n_date and ac_date and (n_date.year, n_date.month) != (ac_date.year, ac_date.month):
+        return ac_date > n_date
+    return None
+
+
+def make_values(count, distinct, seed=0):
+    # 计划表中常见的值：datetime、各种格式的日期字符串、无法识别的文字和空值
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        y, m, d = rng.choice([2024, 2025, 2026]), rng.randint(1, 12), rng.randint(1, 28)
+        pool.append(rng.choice([
+            datetime(y, m, d),
+            f"{y}-{m:02d}-{d:02d}",
+            f"{y}/{m}/{d}",
+            f" {y}-{m:02d} ",
+            f"{y}/{m:02d}",
+            rng.choice(["未定", "TBD", "-", ""]),
+            None,
+        ]))
+    return [(rng.choice(pool), rng.choice(pool)) for _ in range(count)]
+
+
+def bench(func, pairs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for n_val, ac_val in pairs:
+            func(n_val, ac_val)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pairs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日期规范化微基准测试")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--distinct', type=int, default=2000, help="不同值的个数")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pairs = make_values(args.rows, args.distinct)
+    # 两种实现对这些值的判定必须一致
+    for n_val, ac_val in pairs:
+        assert legacy_compare(n_val, ac_val) == normalized_compare(n_val, ac_val), (n_val, ac_val)
+
+    legacy = bench(legacy_compare, pairs, args.repeat)
+    normalized = bench(normalized_compare, pairs, args.repeat)
+    print(f"{args.rows} 行, {args.distinct} 个不同值")
+    print(f"改写前          {legacy:8.2f} us/行")
+    print(f"date_normalizer {normalized:8.2f} us/行  ({legacy / normalized:.1f}x)")
+    print(f"缓存: {date_normalizer.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
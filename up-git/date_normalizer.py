@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+日期规范化
+把Excel单元格中的日期值统一转换为 date 对象（无法识别时为 None），每个值只解析一次
+
+支持的值:
+  datetime / date 对象
+  字符串 YYYY-MM-DD, YYYY/MM/DD, YYYY-MM, YYYY/MM（月、日可不补0，可含全角数字和全角分隔符）
+  Excel日期序列值（只接受 SERIAL_MIN ~ SERIAL_MAX 之间的数字，避免把数量等普通数字当成日期）
+"""
+
+import re
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# 相同字符串的解析结果缓存条数
+CACHE_SIZE = 65536
+
+# 分隔符前后一致：2025-03-05 / 2025/3/5 / 2025-03 / 2025/3
+_DATE_RE = re.compile(r'([0-9]{4})([-/])([0-9]{1,2})(?:\2([0-9]{1,2}))?')
+_FULL_WIDTH = str.maketrans('０１２３４５６７８９／－', '0123456789/-')
+
+# Excel的日期序列值以1899-12-30为0（含1900年2月29日的兼容处理）
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+SERIAL_MIN = 18264  # 1950-01-01
+SERIAL_MAX = 73051  # 2100-01-01
+
+
+def normalize_date(val):
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    if isinstance(val, str):
+        return _parse_text(val) if val else None
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return _from_serial(val)
+    return None
+
+
+def year_month(val):
+    # 年月字符串 "YYYY-MM"，无法识别时为 None
+    d = normalize_date(val)
+    if d is None:
+        return None
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_text(text):
+    match = _DATE_RE.fullmatch(text.strip().translate(_FULL_WIDTH))
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(3))
+    day = int(match.group(4)) if match.group(4) else 1
+    if year < 1 or not 1 <= month <= 12 or not 1 <= day <= monthrange(year, month)[1]:
+        return None
+    return date(year, month, day)
+
+
+def _from_serial(val):
+    if not SERIAL_MIN <= val < SERIAL_MAX:
+        return None
+    return (_EXCEL_EPOCH + timedelta(days=val)).date()
+
+
+def cache_info():
+    return _parse_text.cache_info()